@@ -5,6 +5,14 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+El stream de plazas en vivo (events/<id>/seats/stream/) mantiene conexiones
+abiertas, por lo que debe servirse con un servidor ASGI (uvicorn está en
+requirements.txt):
+
+    uvicorn Certamen.asgi:application
+
+Servido por WSGI (runserver, gunicorn) la página de detalle no abre el stream.
 """
 
 import os
@@ -33,6 +33,7 @@ ALLOWED_HOSTS = []
 INSTALLED_APPS = [
     "events.apps.EventsConfig",
     "auth.apps.AuthConfig",
+    "tasks.apps.TasksConfig",
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -78,6 +79,13 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Toma el bloqueo de escritura al iniciar la transacción: las escrituras
+            # concurrentes esperan (hasta `timeout` segundos) en vez de fallar con
+            # "database is locked" al pasar de lectura a escritura.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -119,3 +127,37 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'index'
 LOGOUT_REDIRECT_URL = 'login'
+
+# Correo (en desarrollo se imprime en consola)
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'Smart Events <no-reply@smartevents.local>'
+
+# Cola de tareas (tasks)
+TASKS_ALWAYS_EAGER = False  # True ejecuta las tareas en línea (tests)
+TASKS_RETRY_BACKOFF = 5  # segundos antes del primer reintento, luego se duplica
+TASKS_RETRY_BACKOFF_MAX = 3600
+TASKS_STALE_AFTER = 600  # segundos para considerar caída una tarea en ejecución
+# Tareas periódicas: run_workers encola cada una cada N segundos (si no hay otra pendiente)
+TASKS_PERIODIC = {
+    'events.reconcile_waitlist_counts': 3600,  # corrige waitlist_count si se desvía
+}
+
+# Plazas en vivo (SSE). Sólo funcionan servidas por ASGI (uvicorn Certamen.asgi:application);
+# bajo WSGI la página no abre el stream. False las desactiva también en ASGI.
+EVENTS_LIVE_SEATS = True
+# Segundos entre sondeos de cambios hechos en otros procesos
+# (0 desactiva el sondeo y sólo se difunden los cambios del propio proceso)
+EVENTS_LIVE_POLL_INTERVAL = 2
+
+# Sala de espera para inscripciones (por evento y por proceso)
+EVENTS_ADMISSION_CONCURRENCY = 4  # inscripciones simultáneas
+EVENTS_ADMISSION_RATE = 10  # personas que salen de la fila por segundo
+EVENTS_ADMISSION_MAX_WAITING = 5000  # sobre esto se pide volver más tarde
+EVENTS_ADMISSION_CLAIM_TIMEOUT = 10  # segundos que se reserva el cupo a quien llaman
+EVENTS_ADMISSION_IDLE_TIMEOUT = 600  # segundos vacía antes de descartar la puerta de un evento
+
+# Control de acceso: los ingresos se escriben por lotes (por evento y por proceso)
+EVENTS_CHECKIN_FLUSH_SIZE = 200  # ingresos acumulados antes de escribir
+EVENTS_CHECKIN_FLUSH_INTERVAL = 2  # segundos máximos entre escrituras
+EVENTS_CHECKIN_REFRESH_INTERVAL = 30  # segundos entre relecturas de asistencias sin ingresos nuevos
+EVENTS_CHECKIN_IDLE_TIMEOUT = 600  # segundos sin lecturas antes de descartar la puerta
@@ -1,9 +1,15 @@
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django import forms
+from events.models import ArchivedEvent, Attendance
+from events.recommendations import recommended_events_for_user
+from events.services import user_events, user_waitlist
+from events.ical import feed_token
+from events.tickets import make_ticket
 
 
 class SignUpForm(UserCreationForm):
@@ -118,9 +124,22 @@ def logout_view(request):
 def profile_view(request):
     """Vista del perfil del usuario"""
     # Obtener los eventos a los que está inscrito
-    user_events = request.user.events_attending.all()
-    
+    events = list(user_events(request.user))
+    # Código firmado que se muestra en la puerta
+    for event in events:
+        event.ticket = make_ticket(event.pk, request.user.pk, event.attendance_id)
+
     context = {
-        'user_events': user_events
+        'user_events': events,
+        # Feed .ics firmado para suscribirse desde una app de calendario
+        'calendar_url': request.build_absolute_uri(
+            reverse('calendar_user', args=[feed_token(request.user.pk)])
+        ),
+        'recommended_events': recommended_events_for_user(request.user),
+        'waitlist_entries': user_waitlist(request.user),
+        # Historial: eventos ya archivados a los que asistió
+        'past_events': ArchivedEvent.objects.filter(
+            attendances__user=request.user, attendances__status=Attendance.CONFIRMED
+        ).defer('image_base64', 'thumbnail_base64').order_by('-event_date'),
     }
     return render(request, 'auth/profile.html', context)
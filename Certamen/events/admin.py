@@ -1,7 +1,13 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django import forms
-from .models import Event
+from django.db.models import Count, Q, Sum
+from .models import (
+    ArchivedAttendance, ArchivedCheckIn, ArchivedEvent, Attendance, CheckInLog, Event,
+    confirmed_attendees_count,
+)
+from .services import promote_waitlist
+from .tasks import generate_thumbnail
 import base64
 
 
@@ -49,6 +55,8 @@ class EventAdminForm(forms.ModelForm):
         # Si se subió una nueva imagen, actualizar el campo base64
         if 'image_base64_full' in self.cleaned_data:
             instance.image_base64 = self.cleaned_data['image_base64_full']
+            # La miniatura anterior ya no corresponde; la nueva la genera un worker
+            instance.thumbnail_base64 = None
         
         if commit:
             instance.save()
@@ -57,6 +65,15 @@ class EventAdminForm(forms.ModelForm):
         return instance
 
 
+class AttendanceInline(admin.TabularInline):
+    """Asistentes del evento, de la inscripción más reciente a la más antigua"""
+    model = Attendance
+    fields = ['user', 'status', 'joined_at', 'price_paid']
+    raw_id_fields = ['user']
+    ordering = ['-joined_at']
+    extra = 0
+
+
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
     """
@@ -101,6 +118,7 @@ class EventAdmin(admin.ModelAdmin):
     readonly_fields = [
         'attendees_count',
         'remaining_slots_display',
+        'waitlist_count',
         'pub_date',
         'image_preview',
         'income'
@@ -129,17 +147,27 @@ class EventAdmin(admin.ModelAdmin):
             'fields': ('location', 'price')
         }),
         ('Capacidad y Asistentes', {
-            'fields': ('capacity', 'attendees', 'attendees_count', 'remaining_slots_display'),
+            'fields': ('capacity', 'attendees_count', 'remaining_slots_display', 'waitlist_count'),
             'description': 'Gestiona la capacidad y los asistentes del evento'
         }),
     )
     
-    # Mejora la selección de asistentes con un widget de selección múltiple
-    filter_horizontal = ['attendees']
+    # Asistentes (con fecha de inscripción, estado y precio pagado)
+    inlines = [AttendanceInline]
     
     # Número de eventos por página
     list_per_page = 25
     
+    def get_queryset(self, request):
+        # Conteo y recaudación en la misma consulta del listado
+        return super().get_queryset(request).annotate(
+            confirmed_count=confirmed_attendees_count(),
+            income_total=Sum(
+                'attendances__price_paid',
+                filter=Q(attendances__status=Attendance.CONFIRMED),
+            ),
+        )
+    
     # ===================== MÉTODOS PERSONALIZADOS =====================
     
     @admin.display(description='Horario', ordering='starts_at')
@@ -154,10 +182,10 @@ class EventAdmin(admin.ModelAdmin):
             return format_html('<span style="color: green; font-weight: bold;">GRATIS</span>')
         return f"${obj.price:,}"
     
-    @admin.display(description='N° Asistentes', ordering='attendees')
+    @admin.display(description='N° Asistentes', ordering='confirmed_count')
     def attendees_count(self, obj):
         """Muestra la cantidad de asistentes"""
-        count = obj.attendees.count()
+        count = obj.attendee_count
         if count == 0:
             return format_html('<span style="color: gray;">0</span>')
         return format_html(
@@ -175,7 +203,7 @@ class EventAdmin(admin.ModelAdmin):
                 'border-radius: 15px; font-weight: bold;">∞ ILIMITADO</span>'
             )
         
-        current = obj.attendees.count()
+        current = obj.attendee_count
         percentage = (current / obj.capacity * 100) if obj.capacity > 0 else 0
         
         # Color según el porcentaje de ocupación
@@ -234,16 +262,18 @@ class EventAdmin(admin.ModelAdmin):
         """Indica si el evento está lleno"""
         if obj.capacity is None:
             return False
-        return obj.attendees.count() >= obj.capacity
+        return obj.attendee_count >= obj.capacity
     
     @admin.display(description='Imagen')
     def image_thumbnail(self, obj):
         """Muestra una miniatura de la imagen en la lista"""
-        if obj.image_base64:
+        # La miniatura se genera en segundo plano; mientras tanto se usa la imagen original
+        image = obj.thumbnail_base64 or obj.image_base64
+        if image:
             return format_html(
                 '<img src="{}" style="width: 60px; height: 60px; object-fit: cover; '
                 'border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.2);" />',
-                obj.image_base64
+                image
             )
         return format_html(
             '<div style="width: 60px; height: 60px; background: #e9ecef; '
@@ -285,12 +315,126 @@ class EventAdmin(admin.ModelAdmin):
             '</div>'
         )
     
-    @admin.display(description='Recaudación')
+    @admin.display(description='Recaudación', ordering='income_total')
     def income(self, obj):
-        return f"${obj.price * obj.attendees.count():,}"
+        # Suma lo que pagó cada asistente, no el precio actual del evento
+        return f"${obj.income_total or 0:,}"
     
     def save_model(self, request, obj, form, change):
         if not change: 
             from django.utils import timezone
             obj.pub_date = timezone.now()
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+        # La miniatura se genera fuera de la petición (manage.py run_workers)
+        if 'image_base64_full' in form.cleaned_data:
+            generate_thumbnail.delay(event_id=obj.pk)
+    
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Quitar asistentes o subir la capacidad libera plazas para la lista de espera
+        if change:
+            promote_waitlist(form.instance.pk)
+
+
+class ArchivedAttendanceInline(admin.TabularInline):
+    """Asistencias del evento archivado, incluidas las canceladas (sólo lectura)"""
+    model = ArchivedAttendance
+    fields = ['user', 'status', 'joined_at', 'price_paid']
+    readonly_fields = fields
+    ordering = ['-joined_at']
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedEvent)
+class ArchivedEventAdmin(admin.ModelAdmin):
+    """
+    Historial de eventos archivados (sólo lectura)
+    """
+    
+    list_display = ['event_name', 'event_date', 'location', 'price', 'capacity', 'attendees_total', 'archived_at']
+    list_filter = ['event_date', 'location']
+    search_fields = ['event_name', 'location', 'description']
+    ordering = ['-event_date', 'starts_at']
+    date_hierarchy = 'event_date'
+    list_per_page = 25
+    exclude = ['image_base64', 'thumbnail_base64']
+    inlines = [ArchivedAttendanceInline]
+    
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+            .defer('image_base64', 'thumbnail_base64')
+            .annotate(attendees_total=Count(
+                'attendances', filter=Q(attendances__status=Attendance.CONFIRMED)
+            ))
+        )
+    
+    @admin.display(description='N° Asistentes', ordering='attendees_total')
+    def attendees_total(self, obj):
+        return obj.attendees_total
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CheckInLog)
+class CheckInLogAdmin(admin.ModelAdmin):
+    """
+    Ingresos registrados en la puerta (sólo lectura)
+    """
+    
+    list_display = ['event', 'user', 'checked_in_at']
+    list_filter = ['checked_in_at']
+    search_fields = ['user__username', 'event__event_name']
+    list_per_page = 50
+    
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+            .select_related('event', 'user')
+            .defer('event__image_base64', 'event__thumbnail_base64', 'event__description')
+        )
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedCheckIn)
+class ArchivedCheckInAdmin(admin.ModelAdmin):
+    """
+    Ingresos de los eventos archivados (sólo lectura)
+    """
+    
+    list_display = ['event', 'user', 'checked_in_at']
+    list_filter = ['checked_in_at']
+    search_fields = ['user__username', 'event__event_name']
+    list_per_page = 50
+    
+    def get_queryset(self, request):
+        return (
+            super().get_queryset(request)
+            .select_related('event', 'user')
+            .defer('event__image_base64', 'event__thumbnail_base64', 'event__description')
+        )
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,195 @@
+# apps/events/admission.py
+"""
+Sala de espera (control de admisión) para las inscripciones.
+
+Cuando abre un evento muy solicitado, todos hacen POST a la vez y el bloqueo
+de escritura de SQLite termina en timeouts. Cada evento tiene una
+`AdmissionGate` en el proceso que:
+
+* limita cuántas inscripciones corren a la vez (`EVENTS_ADMISSION_CONCURRENCY`);
+* entrega números de atención en orden a quienes llegan con la puerta ocupada
+  o con gente ya esperando;
+* llama los números en orden a un ritmo controlado (`EVENTS_ADMISSION_RATE`
+  por segundo) y sólo cuando hay un cupo libre, que queda reservado para ese
+  número durante `EVENTS_ADMISSION_CLAIM_TIMEOUT` segundos;
+* corta la fila en `EVENTS_ADMISSION_MAX_WAITING` personas.
+
+Quien abandona la fila pierde su cupo al vencer la reserva, así que no la
+detiene. El estado es por proceso: con varios workers cada uno aplica sus
+propios límites.
+
+Sólo se crean puertas para eventos que existen, y al crear una se descartan
+las que llevan `EVENTS_ADMISSION_IDLE_TIMEOUT` segundos vacías, para que un
+POST a ids inventados no haga crecer `_gates` sin límite.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from .models import Event
+
+
+@dataclass
+class Admission:
+    admitted: bool
+    ticket: int | None = None
+    position: int = 0  # personas delante, contándose a sí mismo
+    rejected: bool = False  # fila llena
+    retry_after: float = 0.0
+
+
+class AdmissionGate:
+    def __init__(self, concurrency, rate, max_waiting, claim_timeout=10):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.max_waiting = max_waiting
+        self.claim_timeout = claim_timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._issued = 0  # último número entregado
+        self._released = 0  # los números <= a éste ya fueron llamados
+        self._unclaimed = {}  # número llamado -> momento en que se llamó
+        self._tokens = float(concurrency)
+        self._refilled_at = self._used_at = time.monotonic()
+
+    def _free_slots(self):
+        # Un número llamado tiene su cupo reservado hasta que lo usen o expire
+        return self.concurrency - self._active - len(self._unclaimed)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.concurrency, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        # Quien no vuelve a tiempo pierde su cupo y la fila sigue avanzando
+        for ticket, called_at in list(self._unclaimed.items()):
+            if now - called_at > self.claim_timeout:
+                del self._unclaimed[ticket]
+        # Llama números en orden mientras haya fichas y cupos libres
+        while self._tokens >= 1 and self._released < self._issued and self._free_slots() > 0:
+            self._released += 1
+            self._unclaimed[self._released] = now
+            self._tokens -= 1
+
+    def _retry_after(self, position):
+        # Nunca más que media reserva: si lo llaman mientras espera, alcanza a volver
+        wait = position / self.rate if self.rate else 1.0
+        return min(max(1.0, wait), max(1.0, self.claim_timeout / 2))
+
+    def enter(self, ticket=None):
+        """Intenta entrar; si retorna `admitted=True` hay que llamar a `leave()` al terminar"""
+        with self._lock:
+            self._refill()
+            self._used_at = self._refilled_at
+
+            if ticket is not None and ticket in self._unclaimed:
+                del self._unclaimed[ticket]
+                self._active += 1
+                return Admission(admitted=True, ticket=ticket)
+
+            if ticket is not None and not self._released < ticket <= self._issued:
+                ticket = None  # número vencido, de otro proceso o de antes de un reinicio
+
+            if ticket is None:
+                nobody_waiting = self._issued == self._released
+                if nobody_waiting and self._tokens >= 1 and self._free_slots() > 0:
+                    self._tokens -= 1
+                    self._active += 1
+                    return Admission(admitted=True)
+                waiting = self._issued - self._released
+                if waiting >= self.max_waiting:
+                    return Admission(admitted=False, rejected=True, retry_after=self._retry_after(waiting))
+                self._issued += 1
+                ticket = self._issued
+
+            position = ticket - self._released
+            return Admission(
+                admitted=False, ticket=ticket, position=position,
+                retry_after=self._retry_after(position),
+            )
+
+    def leave(self):
+        with self._lock:
+            self._active -= 1
+
+    def is_idle(self, idle_timeout):
+        """Sin nadie adentro ni esperando, y sin uso hace `idle_timeout` segundos"""
+        with self._lock:
+            self._refill()
+            return (
+                self._active == 0
+                and self._issued == self._released
+                and not self._unclaimed
+                and self._refilled_at - self._used_at >= idle_timeout
+            )
+
+    def stats(self):
+        with self._lock:
+            self._refill()
+            return {
+                'active': self._active,
+                'waiting': self._issued - self._released,
+                'issued': self._issued,
+                'released': self._released,
+            }
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def gate_for(event_id):
+    """Puerta del evento, o None si el evento no existe"""
+    with _gates_lock:
+        gate = _gates.get(event_id)
+    if gate is not None:
+        return gate
+    # Sólo al crear la puerta: las demás entradas no consultan la base de datos
+    if not Event.objects.filter(pk=event_id).exists():
+        return None
+    with _gates_lock:
+        gate = _gates.get(event_id)
+        if gate is None:
+            _drop_idle_gates()
+            gate = _gates[event_id] = AdmissionGate(
+                concurrency=getattr(settings, 'EVENTS_ADMISSION_CONCURRENCY', 4),
+                rate=getattr(settings, 'EVENTS_ADMISSION_RATE', 10),
+                max_waiting=getattr(settings, 'EVENTS_ADMISSION_MAX_WAITING', 5000),
+                claim_timeout=getattr(settings, 'EVENTS_ADMISSION_CLAIM_TIMEOUT', 10),
+            )
+        return gate
+
+
+def _drop_idle_gates():
+    # Se llama con _gates_lock tomado
+    idle_timeout = getattr(settings, 'EVENTS_ADMISSION_IDLE_TIMEOUT', 600)
+    for event_id in [event_id for event_id, gate in _gates.items() if gate.is_idle(idle_timeout)]:
+        del _gates[event_id]
+
+
+def request_admission(request, event_id):
+    """Pide paso para el usuario; el número de atención se guarda en la sesión"""
+    gate = gate_for(event_id)
+    if gate is None:
+        # La inscripción fallará con Event.DoesNotExist; no hay cupo que tomar
+        return Admission(admitted=True)
+    key = f'admission_ticket_{event_id}'
+    stored = request.session.get(key)
+    admission = gate.enter(stored)
+    # Sólo se escribe la sesión si el número cambia: cada escritura es un UPDATE
+    # que compite por el bloqueo de SQLite, justo lo que la fila quiere evitar
+    if admission.admitted or admission.rejected:
+        if stored is not None:
+            del request.session[key]
+    elif admission.ticket != stored:
+        request.session[key] = admission.ticket
+    return admission
+
+
+def release_admission(event_id):
+    """Libera el cupo tomado con `request_admission`"""
+    with _gates_lock:
+        gate = _gates.get(event_id)
+    if gate is not None:
+        gate.leave()
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path("events/", views.event_list, name="api_event_list"),
+    path("events/<int:event_id>/", views.event_detail, name="api_event_detail"),
+    path("events/<int:event_id>/join/", views.join, name="api_join_event"),
+    path("events/<int:event_id>/leave/", views.leave, name="api_leave_event"),
+    path("events/<int:event_id>/checkin/", views.checkin, name="api_checkin"),
+    path("me/attendances/", views.my_attendances, name="api_my_attendances"),
+]
@@ -0,0 +1,266 @@
+# apps/events/api/views.py
+"""
+API JSON de sólo lectura para eventos, más inscribirse/desinscribirse.
+
+Las respuestas se arman directamente desde `.values()` (sin instanciar
+modelos). `fields=` elige las columnas; la imagen y la descripción sólo se
+envían si se piden. Los listados usan cursores por (event_date, id) en vez de
+OFFSET, y todas las respuestas GET llevan ETag para responder 304.
+`checkin` valida entradas firmadas en la puerta (sólo staff).
+"""
+import base64
+import binascii
+import hashlib
+import json
+from datetime import date
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET, require_POST
+
+from ..admission import release_admission, request_admission
+from ..checkin import DUPLICATE, OK, desk_for
+from ..models import Attendance, Event, confirmed_attendees_count
+from ..services import join_event, leave_event
+from ..tasks import send_join_confirmation
+
+# Campos de Event que se pueden pedir con ?fields=
+MODEL_FIELDS = (
+    'id', 'event_name', 'pub_date', 'event_date', 'starts_at', 'ends_at', 'location',
+    'description', 'price', 'capacity', 'is_featured', 'image_base64',
+)
+# Campos calculados (requieren contar asistentes)
+COUNT_FIELDS = ('attendees_count', 'remaining_slots')
+ALLOWED_FIELDS = MODEL_FIELDS + COUNT_FIELDS
+
+LIST_FIELDS = (
+    'id', 'event_name', 'event_date', 'starts_at', 'ends_at', 'location', 'price',
+    'capacity', 'is_featured', 'remaining_slots',
+)
+DETAIL_FIELDS = LIST_FIELDS + ('description', 'pub_date', 'attendees_count')
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class BadRequest(Exception):
+    pass
+
+
+# ---------------------------------------------------------------- utilidades
+
+def _json_error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _requested_fields(request, default):
+    raw = request.GET.get('fields')
+    if not raw:
+        return default
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in ALLOWED_FIELDS]
+    if unknown:
+        raise BadRequest(f"Campos desconocidos: {', '.join(unknown)}")
+    return fields
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise BadRequest("limit debe ser un número entero") from None
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _encode_cursor(row):
+    raw = f"{row['event_date'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        event_date, pk = raw.split('|')
+        return date.fromisoformat(event_date), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise BadRequest("Cursor inválido") from None
+
+
+def _values(queryset, fields):
+    """Queryset de diccionarios con sólo las columnas necesarias"""
+    columns = [name for name in fields if name in MODEL_FIELDS]
+    if 'remaining_slots' in fields and 'capacity' not in columns:
+        columns.append('capacity')
+    if any(name in COUNT_FIELDS for name in fields):
+        queryset = queryset.annotate(attendees_count=confirmed_attendees_count())
+        columns.append('attendees_count')
+    return queryset.values(*columns)
+
+
+def _serialize(row, fields):
+    if 'remaining_slots' in fields:
+        capacity = row['capacity']
+        row['remaining_slots'] = None if capacity is None else max(0, capacity - row['attendees_count'])
+    return {name: row[name] for name in fields}
+
+
+def _paginate(request, queryset, fields):
+    """Paginación por cursor (event_date, id), que recorre el índice sin OFFSET"""
+    limit = _limit(request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        event_date, pk = _decode_cursor(cursor)
+        queryset = queryset.filter(Q(event_date__gt=event_date) | Q(event_date=event_date, pk__gt=pk))
+
+    # Las columnas del cursor se leen siempre aunque no se hayan pedido
+    query_fields = tuple(dict.fromkeys(fields + ('id', 'event_date')))
+    rows = list(_values(queryset.order_by('event_date', 'id'), query_fields)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'results': [_serialize(row, fields) for row in rows],
+        'next_cursor': _encode_cursor(rows[-1]) if has_more else None,
+    }
+
+
+def _etag_response(request, payload, private=False):
+    """Respuesta JSON con ETag; 304 si el cliente ya tiene esta versión"""
+    body = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    etag = '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    if private:
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def api_view(view):
+    """Convierte BadRequest en 400 y agrega gzip"""
+    @gzip_page
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as e:
+            return _json_error(str(e), 400)
+    return wrapper
+
+
+def api_login_required(view):
+    """Como login_required, pero responde 401 en JSON en vez de redirigir"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _json_error('Debes iniciar sesión.', 401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def api_staff_required(view):
+    """Sólo para staff; responde 401/403 en JSON"""
+    @wraps(view)
+    @api_login_required
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_staff:
+            return _json_error('No tienes permiso para esta acción.', 403)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+# ---------------------------------------------------------------- vistas
+
+@api_view
+@require_GET
+def event_list(request):
+    """Listado de eventos por fecha"""
+    fields = _requested_fields(request, LIST_FIELDS)
+    return _etag_response(request, _paginate(request, Event.objects.all(), fields))
+
+
+@api_view
+@require_GET
+def event_detail(request, event_id):
+    """Detalle de un evento"""
+    fields = _requested_fields(request, DETAIL_FIELDS)
+    query_fields = tuple(dict.fromkeys(fields + ('id',)))
+    row = _values(Event.objects.filter(pk=event_id), query_fields).first()
+    if row is None:
+        return _json_error('El evento no existe.', 404)
+    return _etag_response(request, _serialize(row, fields))
+
+
+@api_view
+@require_GET
+@api_login_required
+def my_attendances(request):
+    """Eventos a los que está inscrito el usuario"""
+    fields = _requested_fields(request, LIST_FIELDS)
+    # Subconsulta: filtrar por el join directamente alteraría el conteo de asistentes
+    queryset = Event.objects.filter(
+        pk__in=Attendance.objects.confirmed().filter(user=request.user).values('event_id')
+    )
+    return _etag_response(request, _paginate(request, queryset, fields), private=True)
+
+
+@api_view
+@require_POST
+@api_login_required
+def join(request, event_id):
+    """Inscribe al usuario en el evento"""
+    admission = request_admission(request, event_id)
+    if not admission.admitted:
+        # Sala de espera: el cliente debe reintentar tras Retry-After conservando la sesión
+        response = JsonResponse(
+            {'queued': not admission.rejected, 'position': admission.position}, status=429
+        )
+        response['Retry-After'] = int(admission.retry_after + 0.5)
+        return response
+    try:
+        event = join_event(event_id, request.user.id)
+    except Event.DoesNotExist:
+        return _json_error('El evento no existe.', 404)
+    except ValidationError as e:
+        return _json_error(str(e.message), 409)
+    finally:
+        release_admission(event_id)
+    send_join_confirmation.delay(event_id=event.pk, user_id=request.user.id)
+    return JsonResponse({'event_id': event.pk, 'attending': True})
+
+
+@api_view
+@require_POST
+@api_login_required
+def leave(request, event_id):
+    """Desinscribe al usuario del evento"""
+    try:
+        event, _ = leave_event(event_id, request.user.id)
+    except Event.DoesNotExist:
+        return _json_error('El evento no existe.', 404)
+    return JsonResponse({'event_id': event.pk, 'attending': False})
+
+
+@api_view
+@require_POST
+@api_staff_required
+def checkin(request, event_id):
+    """Valida una entrada en la puerta; no lee la base de datos por cada lectura"""
+    token = request.POST.get('token', '')
+    if not token:
+        raise BadRequest("Falta el parámetro token")
+    result = desk_for(event_id).scan(token)
+    # 409: ya ingresó; 422: código inválido, de otro evento, cancelado o inexistente
+    status = 200 if result.status == OK else 409 if result.status == DUPLICATE else 422
+    return JsonResponse(
+        {'status': result.status, 'message': result.message, 'user_id': result.user_id},
+        status=status,
+    )
@@ -0,0 +1,94 @@
+# apps/events/archive.py
+"""
+Archivo de eventos pasados.
+
+Mueve los eventos anteriores a una fecha de corte, junto con todas sus
+asistencias (también las canceladas) y los ingresos registrados en la puerta,
+a `ArchivedEvent`, `ArchivedAttendance` y `ArchivedCheckIn` para que las
+tablas que usan `index`, `home` y `join_event` sólo contengan eventos
+vigentes. Cada lote se copia y se borra dentro de una misma transacción, así
+que un corte a mitad de camino no pierde ni duplica eventos.
+
+El borrado no pasa por el `Collector` de Django: las señales de `Attendance`
+y `Event` correrían una vez por fila (una consulta y una escritura de la
+versión del feed cada una). Se borran las tablas hijas y los eventos con un
+DELETE por tabla y las versiones de los feeds se suben una sola vez por lote.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from .ical import touch_events, touch_users
+from .models import (
+    ArchivedAttendance, ArchivedCheckIn, ArchivedEvent, Attendance, CheckInLog, Event, SimilarEvent,
+    WaitlistEntry,
+)
+
+DEFAULT_BATCH_SIZE = 200
+
+# Columnas que se copian tal cual desde Event y Attendance
+ARCHIVED_FIELDS = [
+    field.attname
+    for field in ArchivedEvent._meta.concrete_fields
+    if field.attname != 'archived_at'
+]
+ARCHIVED_ATTENDANCE_FIELDS = [
+    field.attname
+    for field in ArchivedAttendance._meta.concrete_fields
+    if field.attname != 'id'
+]
+
+
+def archive_batch(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """Archiva un lote de eventos anteriores a `cutoff`; retorna (eventos, asistencias)"""
+    with transaction.atomic():
+        ids = list(
+            Event.objects
+            .filter(event_date__lt=cutoff)
+            .order_by('event_date', 'id')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, 0
+
+        rows = Event.objects.filter(pk__in=ids).values(*ARCHIVED_FIELDS)
+        ArchivedEvent.objects.bulk_create([ArchivedEvent(**row) for row in rows])
+
+        attendance = [
+            ArchivedAttendance(**row)
+            for row in (
+                Attendance.objects
+                .filter(event_id__in=ids)
+                .values(*ARCHIVED_ATTENDANCE_FIELDS)
+            )
+        ]
+        ArchivedAttendance.objects.bulk_create(attendance, batch_size=1000)
+        ArchivedCheckIn.objects.bulk_create(
+            [
+                ArchivedCheckIn(**row)
+                for row in (
+                    CheckInLog.objects
+                    .filter(event_id__in=ids)
+                    .values('event_id', 'user_id', 'checked_in_at')
+                )
+            ],
+            batch_size=1000,
+        )
+
+        # Los eventos que recomendaban a los archivados deben recalcular sus similares
+        Event.objects.filter(similar_events__similar_id__in=ids).exclude(pk__in=ids).update(
+            similar_stale=True
+        )
+        # CheckInLog antes que Attendance (lo referencia) y los eventos al final
+        for queryset in (
+            CheckInLog.objects.filter(event_id__in=ids),
+            WaitlistEntry.objects.filter(event_id__in=ids),
+            Attendance.objects.filter(event_id__in=ids),
+            SimilarEvent.objects.filter(Q(event_id__in=ids) | Q(similar_id__in=ids)),
+            Event.objects.filter(pk__in=ids),
+        ):
+            queryset._raw_delete(queryset.db)
+
+        touch_events()
+        touch_users(row.user_id for row in attendance)
+    return len(ids), len(attendance)
+
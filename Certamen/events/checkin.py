@@ -0,0 +1,254 @@
+# apps/events/checkin.py
+"""
+Control de acceso en la puerta.
+
+Cada evento tiene un `CheckInDesk` en el proceso que valida entradas
+(`events.tickets`) sin ir a la base de datos en cada lectura:
+
+* al abrir carga una sola vez quiénes ya ingresaron y el estado de cada
+  asistencia del evento; una entrada cuya asistencia no está (p. ej. se borró)
+  se busca una vez y, si no existe, se rechaza;
+* rechaza los duplicados con un conjunto en memoria;
+* acumula los ingresos y los escribe con un solo `bulk_create` cada
+  `EVENTS_CHECKIN_FLUSH_SIZE` ingresos o `EVENTS_CHECKIN_FLUSH_INTERVAL`
+  segundos, aprovechando para refrescar las asistencias (si se escribió algo,
+  o cada `EVENTS_CHECKIN_REFRESH_INTERVAL` segundos). Un hilo en segundo
+  plano escribe lo pendiente de las puertas que dejaron de recibir lecturas
+  y descarta las que llevan `EVENTS_CHECKIN_IDLE_TIMEOUT` segundos sin uso.
+
+Si el lote falla por integridad (una asistencia o un usuario borrados entre la
+lectura y la escritura) se reintenta fila por fila y las que no entran se
+descartan y quedan en el log, para no reintentar el mismo lote para siempre.
+
+Como en la sala de espera, el estado es por proceso: con varias puertas en
+procesos distintos la restricción única de `CheckInLog` descarta el segundo
+ingreso al escribir, pero la lectura ya se habrá aceptado en ambas.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+
+from .models import Attendance, CheckInLog
+from .tickets import read_ticket
+
+logger = logging.getLogger(__name__)
+
+OK = 'ok'
+INVALID = 'invalid'
+WRONG_EVENT = 'wrong_event'
+CANCELLED = 'cancelled'
+UNKNOWN = 'unknown'
+DUPLICATE = 'duplicate'
+
+MESSAGES = {
+    OK: "Entrada válida",
+    INVALID: "Código inválido",
+    WRONG_EVENT: "La entrada es de otro evento",
+    CANCELLED: "La inscripción fue cancelada",
+    UNKNOWN: "La inscripción no existe",
+    DUPLICATE: "Esta entrada ya ingresó",
+}
+
+
+@dataclass
+class CheckIn:
+    status: str
+    user_id: int | None = None
+
+    @property
+    def accepted(self):
+        return self.status == OK
+
+    @property
+    def message(self):
+        return MESSAGES[self.status]
+
+
+class CheckInDesk:
+    def __init__(self, event_id, flush_size=200, flush_interval=2.0, refresh_interval=30.0):
+        self.event_id = event_id
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._seen = set()  # usuarios que ya ingresaron
+        self._attendances = {}  # id de asistencia -> estado
+        self._pending = []
+        self._flushed_at = self._refreshed_at = self._scanned_at = time.monotonic()
+        self._closed = False  # ya no está en `_desks`: escribe en cada lectura
+
+    def _load(self):
+        self._seen = set(
+            CheckInLog.objects.filter(event_id=self.event_id).values_list('user_id', flat=True)
+        )
+        self._refresh_attendances()
+        self._loaded = True
+
+    def _refresh_attendances(self):
+        self._attendances = dict(
+            Attendance.objects.filter(event_id=self.event_id).values_list('pk', 'status')
+        )
+        self._refreshed_at = time.monotonic()
+
+    def _attendance_status(self, attendance_id):
+        status = self._attendances.get(attendance_id)
+        if status is None:
+            # Inscrita después de la última carga, o borrada
+            status = (
+                Attendance.objects
+                .filter(pk=attendance_id, event_id=self.event_id)
+                .values_list('status', flat=True)
+                .first()
+            )
+            if status is not None:
+                self._attendances[attendance_id] = status
+        return status
+
+    def scan(self, token):
+        """Valida una entrada y registra el ingreso"""
+        ticket = read_ticket(token)
+        if ticket is None:
+            return CheckIn(INVALID)
+        if ticket.event_id != self.event_id:
+            return CheckIn(WRONG_EVENT, ticket.user_id)
+
+        with self._lock:
+            self._scanned_at = time.monotonic()
+            if not self._loaded:
+                self._load()
+            status = self._attendance_status(ticket.attendance_id)
+            if status is None:
+                return CheckIn(UNKNOWN, ticket.user_id)
+            if status == Attendance.CANCELLED:
+                return CheckIn(CANCELLED, ticket.user_id)
+            if ticket.user_id in self._seen:
+                return CheckIn(DUPLICATE, ticket.user_id)
+            self._seen.add(ticket.user_id)
+            self._pending.append(CheckInLog(
+                event_id=self.event_id, user_id=ticket.user_id, attendance_id=ticket.attendance_id,
+            ))
+            due = (
+                self._closed
+                or len(self._pending) >= self.flush_size
+                or time.monotonic() - self._flushed_at >= self.flush_interval
+            )
+            if due:
+                try:
+                    self._flush()
+                except DatabaseError:
+                    pass  # el ingreso ya es válido; se escribe en el próximo intento
+        return CheckIn(OK, ticket.user_id)
+
+    def _flush(self):
+        self._flushed_at = time.monotonic()
+        if not self._loaded:
+            return 0
+        pending = self._pending
+        if pending:
+            # ignore_conflicts: otro proceso pudo registrar a la misma persona.
+            # Si la base de datos falla, los ingresos quedan pendientes para el
+            # próximo intento; si es un error de integridad, se aísla la fila.
+            try:
+                with transaction.atomic():
+                    CheckInLog.objects.bulk_create(pending, batch_size=500, ignore_conflicts=True)
+            except IntegrityError:
+                self._write_one_by_one(pending)
+            self._pending = []
+        if pending or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self._refresh_attendances()
+        return len(pending)
+
+    def _write_one_by_one(self, pending):
+        for log in pending:
+            try:
+                with transaction.atomic():
+                    CheckInLog.objects.bulk_create([log], ignore_conflicts=True)
+            except IntegrityError:
+                logger.warning(
+                    "Ingreso descartado: evento %s, usuario %s, asistencia %s",
+                    log.event_id, log.user_id, log.attendance_id,
+                )
+
+    def flush(self):
+        """Escribe los ingresos pendientes; retorna cuántos eran"""
+        with self._lock:
+            return self._flush()
+
+    def close_if_idle(self, idle_timeout):
+        """Cierra la puerta si no tiene pendientes ni lecturas hace `idle_timeout` segundos"""
+        with self._lock:
+            if self._pending or time.monotonic() - self._scanned_at < idle_timeout:
+                return False
+            self._closed = True
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {'checked_in': len(self._seen), 'pending': len(self._pending)}
+
+
+_desks = {}
+_desks_lock = threading.Lock()
+
+
+def desk_for(event_id):
+    with _desks_lock:
+        desk = _desks.get(event_id)
+        if desk is None:
+            desk = _desks[event_id] = CheckInDesk(
+                event_id,
+                flush_size=getattr(settings, 'EVENTS_CHECKIN_FLUSH_SIZE', 200),
+                flush_interval=getattr(settings, 'EVENTS_CHECKIN_FLUSH_INTERVAL', 2),
+                refresh_interval=getattr(settings, 'EVENTS_CHECKIN_REFRESH_INTERVAL', 30),
+            )
+    _ensure_flusher()
+    return desk
+
+
+def flush_all():
+    with _desks_lock:
+        desks = list(_desks.values())
+    return sum(desk.flush() for desk in desks)
+
+
+def drop_idle_desks():
+    """Descarta las puertas sin uso para que `_desks` no crezca con cada evento"""
+    idle_timeout = getattr(settings, 'EVENTS_CHECKIN_IDLE_TIMEOUT', 600)
+    with _desks_lock:
+        idle = [
+            event_id for event_id, desk in _desks.items() if desk.close_if_idle(idle_timeout)
+        ]
+        for event_id in idle:
+            del _desks[event_id]
+    return len(idle)
+
+
+_flusher = None
+
+
+def _ensure_flusher():
+    global _flusher
+    interval = getattr(settings, 'EVENTS_CHECKIN_FLUSH_INTERVAL', 2)
+    if not interval:
+        return
+    with _desks_lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(target=_flush_loop, args=(interval,), name='checkin-flusher', daemon=True)
+        _flusher.start()
+
+
+def _flush_loop(interval):
+    stop = threading.Event()
+    while not stop.wait(interval):
+        close_old_connections()
+        try:
+            flush_all()
+            drop_idle_desks()
+        except Exception:
+            continue  # p. ej. base de datos bloqueada: se reintenta en el próximo ciclo
@@ -0,0 +1,197 @@
+# apps/events/ical.py
+"""
+Feeds iCalendar (.ics) para apps de calendario.
+
+Hay dos feeds: todos los próximos eventos y los eventos de un usuario, este
+último en una URL firmada (`feed_token`) para que la app lo pida sin sesión.
+Los feeds se generan como stream recorriendo `.values().iterator()` por
+bloques, sin instanciar modelos.
+
+Las apps consultan cada pocos minutos, así que el ETag y el Last-Modified no
+dependen del contenido: salen de la tabla `CalendarVersion`, que se actualiza
+en la misma transacción que cambia un evento (`touch_events`) o la asistencia
+de un usuario (`touch_users`). Al estar en la base de datos la ven todos los
+procesos, y responder 304 cuesta una consulta por clave primaria, sin recorrer
+eventos ni asistencias.
+
+Cada versión nueva es un segundo entero mayor que todas las anteriores, así
+que el Last-Modified de cualquier feed afectado avanza aunque dos cambios
+caigan en el mismo segundo.
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.db.models import Max, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Attendance, CalendarVersion, Event
+
+FEED_SALT = 'events.calendar'
+CHUNK_SIZE = 500
+EVENTS_VERSION_KEY = 'events'
+FEED_FIELDS = (
+    'id', 'event_name', 'event_date', 'starts_at', 'ends_at', 'location', 'description', 'pub_date',
+)
+
+
+# ---------------------------------------------------------------- URL firmada
+
+def feed_token(user_id):
+    return signing.Signer(salt=FEED_SALT).sign(str(user_id))
+
+
+def user_id_from_token(token):
+    """Id del usuario del token, o None si la firma no es válida"""
+    try:
+        return int(signing.Signer(salt=FEED_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+# ---------------------------------------------------------------- versiones
+
+def _user_version_key(user_id):
+    return f'user:{user_id}'
+
+
+def touch(keys):
+    """Sube la versión de los feeds; llamar dentro de la transacción del cambio"""
+    keys = list(keys)
+    if not keys:
+        return
+    # max(ahora, última versión + 1), con la última leída por el índice de version.
+    # En SQLite las escrituras van de a una, así que no hay dos iguales.
+    latest = CalendarVersion.objects.order_by('-version').values('version')[:1]
+    following = Coalesce(Subquery(latest), Value(0)) + 1
+    now = int(time.time())
+    bumped = CalendarVersion.objects.filter(key__in=keys).update(version=Greatest(Value(now), following))
+    if bumped < len(keys):
+        version = max(now, (CalendarVersion.objects.aggregate(last=Max('version'))['last'] or 0) + 1)
+        CalendarVersion.objects.bulk_create(
+            [CalendarVersion(key=key, version=version) for key in keys], ignore_conflicts=True
+        )
+
+
+def touch_events():
+    touch([EVENTS_VERSION_KEY])
+
+
+def touch_users(user_ids):
+    touch(_user_version_key(user_id) for user_id in set(user_ids))
+
+
+def _versions(keys):
+    found = dict(CalendarVersion.objects.filter(key__in=keys).values_list('key', 'version'))
+    # Sin fila: el feed no cambió desde que existe la tabla
+    return [found.get(key, 0) for key in keys]
+
+
+def feed_validators(user_id=None):
+    """(etag, last_modified) del feed con una sola consulta a `CalendarVersion`"""
+    keys = [EVENTS_VERSION_KEY]
+    if user_id is not None:
+        keys.append(_user_version_key(user_id))
+    # "Próximos" cambia a medianoche aunque nadie modifique nada
+    midnight = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+    versions = [*_versions(keys), midnight.timestamp()]
+    raw = '|'.join([str(user_id), *map(str, versions)])
+    etag = '"%s"' % hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    return etag, int(max(versions))
+
+
+# ---------------------------------------------------------------- consultas
+
+def upcoming_rows():
+    return (
+        Event.objects
+        .filter(event_date__gte=timezone.localdate())
+        .order_by('event_date', 'starts_at', 'id')
+        .values(*FEED_FIELDS)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def user_rows(user_id):
+    # Recorre el índice (user, event_date) de Attendance
+    return (
+        Event.objects
+        .filter(attendances__user_id=user_id, attendances__status=Attendance.CONFIRMED)
+        .order_by('attendances__event_date', 'starts_at')
+        .values(*FEED_FIELDS)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+# ---------------------------------------------------------------- formato
+
+def _escape(value):
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '')
+    )
+
+
+def _fold(line):
+    # RFC 5545: líneas de hasta 75 octetos; las que siguen empiezan con un espacio
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    start, limit = 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1  # no cortar un carácter UTF-8 por la mitad
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _vevent(row, base_url, domain):
+    start = timezone.make_aware(datetime.combine(row['event_date'], row['starts_at']))
+    end = timezone.make_aware(datetime.combine(row['event_date'], row['ends_at']))
+    if end <= start:
+        end += timedelta(days=1)  # termina pasada la medianoche
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:event-{row['id']}@{domain}",
+        f"DTSTAMP:{_utc(row['pub_date'])}",
+        f'DTSTART:{_utc(start)}',
+        f'DTEND:{_utc(end)}',
+        f"SUMMARY:{_escape(row['event_name'])}",
+        f"LOCATION:{_escape(row['location'])}",
+        f"DESCRIPTION:{_escape(row['description'])}",
+        f"URL:{base_url}{reverse('event_detail', args=[row['id']])}",
+        'END:VEVENT',
+    ]
+    return ''.join(_fold(line) for line in lines)
+
+
+def render_feed(rows, name, base_url, domain):
+    """Genera el calendario por partes; cada parte agrupa hasta CHUNK_SIZE eventos"""
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Smart Events//Certamen//ES',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT15M',
+        'X-PUBLISHED-TTL:PT15M',
+    ])
+    buffer = []
+    for row in rows:
+        buffer.append(_vevent(row, base_url, domain))
+        if len(buffer) >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    buffer.append('END:VCALENDAR\r\n')
+    yield ''.join(buffer)
@@ -0,0 +1,156 @@
+# apps/events/live.py
+"""
+Difusión en vivo de las plazas restantes (Server-Sent Events).
+
+`seat_hub` mantiene, por proceso, los suscriptores de cada evento y el último
+conteo conocido. `join_event`/`leave_event` publican el conteo nuevo al
+confirmar la transacción y todos los suscriptores lo reciben sin leer la base
+de datos. Cada suscriptor tiene una cola de tamaño 1: si no alcanza a leer,
+sólo recibe el valor más reciente.
+
+Con varios workers, un cambio hecho en otro proceso no pasa por este hub. El
+hilo de sondeo cumple el rol de un pub/sub local: cada
+`EVENTS_LIVE_POLL_INTERVAL` segundos hace una sola consulta para todos los
+eventos observados en el proceso y publica los que cambiaron (también cubre
+cambios hechos desde el admin).
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from .models import Event, confirmed_attendees_count
+
+KEEPALIVE_SECONDS = 15
+
+
+def seats_payload(event_id, capacity, attendees):
+    remaining = None if capacity is None else max(0, capacity - attendees)
+    return {
+        'event_id': event_id,
+        'attendees': attendees,
+        'capacity': capacity,
+        'remaining': remaining,
+    }
+
+
+def read_seats(event_ids):
+    """Conteo actual de varios eventos en una sola consulta"""
+    rows = (
+        Event.objects
+        .filter(pk__in=event_ids)
+        .annotate(confirmed_count=confirmed_attendees_count())
+        .values_list('pk', 'capacity', 'confirmed_count')
+    )
+    return {pk: seats_payload(pk, capacity, count) for pk, capacity, count in rows}
+
+
+class SeatHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)  # event_id -> {(loop, queue)}
+        self._last = {}  # event_id -> último payload publicado
+        self._poller = None
+
+    # ---------------------------------------------------------- publicación
+
+    def publish(self, payload):
+        """Entrega el payload a los suscriptores del evento; seguro desde cualquier hilo"""
+        event_id = payload['event_id']
+        with self._lock:
+            # Sin suscriptores no se guarda nada: el próximo leerá el valor actual
+            if event_id not in self._subscribers or self._last.get(event_id) == payload:
+                return
+            self._last[event_id] = payload
+            subscribers = list(self._subscribers.get(event_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, payload)
+            except RuntimeError:
+                pass  # el loop del suscriptor ya se cerró
+
+    @staticmethod
+    def _offer(queue, payload):
+        # Cola de tamaño 1: se reemplaza el valor pendiente por el más nuevo
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(payload)
+
+    # ---------------------------------------------------------- suscripción
+
+    def _current(self, event_id):
+        """Último conteo conocido; si no hay, una lectura que aprovechan todos"""
+        with self._lock:
+            payload = self._last.get(event_id)
+        if payload is None:
+            payload = read_seats([event_id]).get(event_id)
+            if payload is not None:
+                with self._lock:
+                    payload = self._last.setdefault(event_id, payload)
+        return payload
+
+    async def stream(self, event_id):
+        """Generador SSE para un evento"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=1)
+        subscriber = (loop, queue)
+        with self._lock:
+            self._subscribers[event_id].add(subscriber)
+        self._ensure_poller()
+        try:
+            yield "retry: 3000\n\n"
+            payload = await sync_to_async(self._current)(event_id)
+            if payload is not None:
+                yield self._format(payload)
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield self._format(payload)
+        finally:
+            with self._lock:
+                self._subscribers[event_id].discard(subscriber)
+                if not self._subscribers[event_id]:
+                    del self._subscribers[event_id]
+                    self._last.pop(event_id, None)
+
+    @staticmethod
+    def _format(payload):
+        return f"event: seats\ndata: {json.dumps(payload)}\n\n"
+
+    # ---------------------------------------------------------- sondeo
+
+    def _ensure_poller(self):
+        interval = getattr(settings, 'EVENTS_LIVE_POLL_INTERVAL', 2)
+        if not interval:
+            return
+        with self._lock:
+            if self._poller is not None and self._poller.is_alive():
+                return
+            self._poller = threading.Thread(
+                target=self._poll, args=(interval,), name='seat-hub-poller', daemon=True
+            )
+            self._poller.start()
+
+    def _poll(self, interval):
+        stop = threading.Event()
+        while not stop.wait(interval):
+            with self._lock:
+                watched = list(self._subscribers)
+            if not watched:
+                continue
+            close_old_connections()
+            try:
+                current = read_seats(watched)
+            except Exception:
+                continue  # p. ej. base de datos bloqueada: se reintenta en el próximo ciclo
+            for payload in current.values():
+                self.publish(payload)
+
+
+seat_hub = SeatHub()
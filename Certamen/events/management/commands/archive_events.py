@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from events.archive import DEFAULT_BATCH_SIZE, archive_batch
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = "Mueve los eventos pasados, sus asistentes y sus ingresos a las tablas de archivo"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help="Fecha de corte (AAAA-MM-DD); se archivan los eventos anteriores")
+        parser.add_argument('--days', type=int, default=30,
+                            help="Si no se indica --before, archiva los eventos de hace más de N días")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Sólo informa cuántos eventos se archivarían")
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = date.fromisoformat(options['before'])
+            except ValueError:
+                raise CommandError("--before debe tener el formato AAAA-MM-DD") from None
+        else:
+            cutoff = timezone.localdate() - timedelta(days=options['days'])
+
+        if options['dry_run']:
+            pending = Event.objects.filter(event_date__lt=cutoff).count()
+            self.stdout.write(f"Se archivarían {pending} eventos anteriores al {cutoff:%d/%m/%Y}")
+            return
+
+        total_events = total_attendance = 0
+        while True:
+            events, attendance = archive_batch(cutoff, options['batch_size'])
+            if not events:
+                break
+            total_events += events
+            total_attendance += attendance
+            self.stdout.write(f"Lote archivado: {events} eventos, {attendance} asistencias")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archivados {total_events} eventos y {total_attendance} asistencias "
+            f"anteriores al {cutoff:%d/%m/%Y}"
+        ))
@@ -0,0 +1,55 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from events import views
+from events.api import views as api_views
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = "Compara el rendimiento de la API JSON contra las vistas HTML equivalentes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=100,
+                            help="Eventos por página en la API (la vista HTML siempre lista todos)")
+
+    def handle(self, *args, **options):
+        event = Event.objects.order_by('event_date', 'id').first()
+        if event is None:
+            raise CommandError("No hay eventos en la base de datos para medir.")
+
+        iterations = options['iterations']
+        limit = options['limit']
+        cases = [
+            ("HTML index", views.index, '/events/', ()),
+            ("API listado", api_views.event_list, f'/events/api/events/?limit={limit}', ()),
+            ("API listado + imagen", api_views.event_list,
+             f'/events/api/events/?limit={limit}&fields=id,event_name,image_base64', ()),
+            ("HTML detalle", views.event_detail, f'/events/{event.pk}/', (event.pk,)),
+            ("API detalle", api_views.event_detail, f'/events/api/events/{event.pk}/', (event.pk,)),
+        ]
+
+        self.stdout.write(f"{'Caso':<24}{'req/s':>10}{'ms/req':>10}{'bytes':>12}")
+        for name, view, path, view_args in cases:
+            rate, bytes_per_request = self.measure(view, path, view_args, iterations)
+            self.stdout.write(
+                f"{name:<24}{rate:>10.1f}{1000 / rate:>10.2f}{bytes_per_request:>12}"
+            )
+
+    def measure(self, view, path, view_args, iterations):
+        factory = RequestFactory()
+        size = 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            request = factory.get(path, HTTP_ACCEPT_ENCODING='gzip')
+            request.user = AnonymousUser()
+            request.session = {}
+            request._messages = []
+            response = view(request, *view_args)
+            size = len(response.content)
+        elapsed = time.perf_counter() - started
+        return iterations / elapsed, size
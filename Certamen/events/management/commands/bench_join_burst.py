@@ -0,0 +1,190 @@
+import itertools
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from events import admission as admission_module
+from events.admission import AdmissionGate
+from events.models import Event
+from events.services import join_event
+
+BENCH_PREFIX = 'bench_burst_'
+
+
+class Command(BaseCommand):
+    help = "Simula una ráfaga de inscripciones contra join_event, con y sin sala de espera"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300)
+        parser.add_argument('--capacity', type=int, default=100)
+        parser.add_argument('--threads', type=int, default=32, help="Clientes simultáneos")
+        parser.add_argument('--concurrency', type=int, default=4, help="Límite de la sala de espera")
+        parser.add_argument('--rate', type=float, default=200, help="Personas liberadas por segundo")
+        parser.add_argument('--poll', type=float, default=0.01,
+                            help="Segundos que espera un cliente en la fila antes de reintentar")
+        parser.add_argument('--no-gate', action='store_true', help="Llama a join_event sin sala de espera")
+        parser.add_argument('--view', action='store_true',
+                            help="Inscribe a través de la vista (middleware, sesión y sala de espera reales)")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+        User.objects.bulk_create([
+            User(username=f'{BENCH_PREFIX}{i}', password='!') for i in range(options['users'])
+        ])
+        user_ids = list(
+            User.objects.filter(username__startswith=BENCH_PREFIX).order_by('pk').values_list('pk', flat=True)
+        )
+        now = timezone.now()
+        event = Event.objects.create(
+            event_name='Benchmark ráfaga', pub_date=now, event_date=now.date(),
+            starts_at=now.time(), ends_at=now.time(), location='-', description='-',
+            price=0, capacity=options['capacity'],
+        )
+        try:
+            if options['view']:
+                self.run_view(event.pk, user_ids, options)
+            else:
+                self.run(event.pk, user_ids, options)
+        finally:
+            admission_module._gates.pop(event.pk, None)
+            event.delete()
+            User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+
+    def run(self, event_id, user_ids, options):
+        gate = None
+        if not options['no_gate']:
+            gate = AdmissionGate(options['concurrency'], options['rate'], max_waiting=len(user_ids))
+        admitted_order = itertools.count()
+        results = []
+        results_lock = threading.Lock()
+
+        def attempt(user_id):
+            started = time.perf_counter()
+            ticket = None
+            order = None
+            try:
+                if gate is not None:
+                    while True:
+                        admission = gate.enter(ticket)
+                        if admission.admitted:
+                            order = next(admitted_order)
+                            break
+                        ticket = admission.ticket
+                        time.sleep(options['poll'])
+                try:
+                    join_event(event_id, user_id)
+                    outcome = 'inscrito'
+                except ValidationError:
+                    outcome = 'completo'
+                except OperationalError:
+                    outcome = 'error'
+                finally:
+                    if gate is not None:
+                        gate.leave()
+            finally:
+                connection.close()
+            with results_lock:
+                results.append((outcome, ticket, order, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(attempt, user_ids))
+        elapsed = time.perf_counter() - started
+
+        outcomes = {name: sum(1 for r in results if r[0] == name) for name in ('inscrito', 'completo', 'error')}
+        latencies = sorted(r[3] for r in results)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+
+        mode = "sin sala de espera" if gate is None else (
+            f"sala de espera (concurrencia={options['concurrency']}, ritmo={options['rate']}/s)"
+        )
+        self.stdout.write(f"Modo: {mode}")
+        self.stdout.write(f"Solicitudes: {len(results)} en {elapsed:.2f}s ({len(results) / elapsed:.1f}/s)")
+        self.stdout.write(
+            f"Inscritos: {outcomes['inscrito']} | Completo: {outcomes['completo']} | "
+            f"Errores (bloqueo de BD): {outcomes['error']}"
+        )
+        self.stdout.write(
+            f"Latencia p50: {statistics.median(latencies) * 1000:.1f} ms | p95: {p95 * 1000:.1f} ms"
+        )
+        seated = Event.objects.get(pk=event_id).attendee_count
+        self.stdout.write(f"Asistentes en BD: {seated}/{options['capacity']}")
+
+        if gate is not None:
+            queued = sorted((ticket, order) for _, ticket, order, _ in results if ticket is not None)
+            orders = [order for _, order in queued]
+            inversions = sum(1 for a, b in zip(orders, orders[1:]) if a > b)
+            self.stdout.write(
+                f"Equidad: {len(queued)} esperaron en la fila; "
+                f"{inversions} pares consecutivos entraron fuera de orden"
+            )
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def run_view(self, event_id, user_ids, options):
+        """Como `run`, pero cada cliente hace POST a join_event_view con su propia sesión"""
+        User = get_user_model()
+        clients = {}
+        for user in User.objects.filter(pk__in=user_ids):
+            clients[user.pk] = Client()
+            clients[user.pk].force_login(user)
+        # La vista usa la sala de espera del evento: se reemplaza por una con los parámetros del benchmark
+        admission_module._gates[event_id] = AdmissionGate(
+            options['concurrency'], options['rate'], max_waiting=len(user_ids)
+        )
+        url = reverse('join_event', args=[event_id])
+        counts = {'posts': 0, 'session_writes': 0}
+        counts_lock = threading.Lock()
+        latencies = []
+
+        def count_session_writes(execute, sql, params, many, context):
+            if sql.startswith('UPDATE "django_session"'):
+                with counts_lock:
+                    counts['session_writes'] += 1
+            return execute(sql, params, many, context)
+
+        def attempt(user_id):
+            started = time.perf_counter()
+            posts = 0
+            try:
+                with connection.execute_wrapper(count_session_writes):
+                    while True:
+                        posts += 1
+                        if clients[user_id].post(url).status_code == 302:
+                            break
+                        time.sleep(options['poll'])
+            finally:
+                connection.close()
+            with counts_lock:
+                counts['posts'] += posts
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(attempt, user_ids))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+        self.stdout.write(
+            f"Modo: vista con sala de espera (concurrencia={options['concurrency']}, ritmo={options['rate']}/s)"
+        )
+        self.stdout.write(f"Usuarios: {len(user_ids)} en {elapsed:.2f}s | POST totales: {counts['posts']}")
+        self.stdout.write(
+            f"Escrituras de sesión: {counts['session_writes']} "
+            f"({counts['session_writes'] / counts['posts']:.2f} por POST)"
+        )
+        self.stdout.write(
+            f"Latencia p50: {statistics.median(latencies) * 1000:.1f} ms | p95: {p95 * 1000:.1f} ms"
+        )
+        seated = Event.objects.get(pk=event_id).attendee_count
+        self.stdout.write(f"Asistentes en BD: {seated}/{options['capacity']}")
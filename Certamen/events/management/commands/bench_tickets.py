@@ -0,0 +1,73 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from events.checkin import CheckInDesk
+from events.models import Attendance, CheckInLog, Event
+from events.tickets import make_ticket, read_ticket
+
+BENCH_PREFIX = 'bench_ticket_'
+
+
+class Command(BaseCommand):
+    help = "Mide cuántas entradas por segundo se verifican y registran en la puerta"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attendees', type=int, default=5000)
+        parser.add_argument('--flush-size', type=int, default=200)
+        parser.add_argument('--duplicates', type=float, default=0.1,
+                            help="Fracción de lecturas repetidas (entradas escaneadas dos veces)")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+        User.objects.bulk_create([
+            User(username=f'{BENCH_PREFIX}{i}', password='!') for i in range(options['attendees'])
+        ])
+        users = User.objects.filter(username__startswith=BENCH_PREFIX)
+        now = timezone.now()
+        event = Event.objects.create(
+            event_name='Benchmark entradas', pub_date=now, event_date=now.date(),
+            starts_at=now.time(), ends_at=now.time(), location='-', description='-', price=0,
+        )
+        try:
+            Attendance.objects.bulk_create(
+                [Attendance(event=event, user_id=pk) for pk in users.values_list('pk', flat=True)],
+                batch_size=1000,
+            )
+            tickets = [
+                make_ticket(event.pk, user_id, attendance_id)
+                for attendance_id, user_id in event.attendances.values_list('pk', 'user_id')
+            ]
+            self.run(event.pk, tickets, options)
+        finally:
+            event.delete()
+            users.delete()
+
+    def run(self, event_id, tickets, options):
+        started = time.perf_counter()
+        for token in tickets:
+            read_ticket(token)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Sólo firma: {len(tickets)} verificaciones en {elapsed:.2f}s ({len(tickets) / elapsed:.0f}/s)"
+        )
+
+        repeated = tickets[:int(len(tickets) * options['duplicates'])]
+        scans = tickets + repeated
+        desk = CheckInDesk(event_id, flush_size=options['flush_size'], flush_interval=3600)
+        started = time.perf_counter()
+        results = [desk.scan(token) for token in scans]
+        desk.flush()
+        elapsed = time.perf_counter() - started
+        accepted = sum(1 for result in results if result.accepted)
+        self.stdout.write(
+            f"Puerta (firma + duplicados + escritura por lotes de {options['flush_size']}): "
+            f"{len(scans)} lecturas en {elapsed:.2f}s ({len(scans) / elapsed:.0f}/s)"
+        )
+        self.stdout.write(
+            f"Aceptadas: {accepted} | Rechazadas por duplicado: {len(scans) - accepted} | "
+            f"En CheckInLog: {CheckInLog.objects.filter(event_id=event_id).count()}"
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from events.recommendations import DEFAULT_CHUNK_SIZE, DEFAULT_TOP_K, build_similar_events
+
+
+class Command(BaseCommand):
+    help = "Recalcula los eventos similares (co-asistencia) de los eventos cuya asistencia cambió"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recalcula todos los eventos")
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        count = build_similar_events(
+            full=options['full'],
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Eventos recalculados: {count}"))
@@ -0,0 +1,48 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from events.checkin import CheckInDesk
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        "Valida entradas en la puerta de un evento. Los códigos se pasan como argumentos "
+        "o uno por línea por la entrada estándar (p. ej. desde un lector de códigos)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('tokens', nargs='*', help="Códigos de entrada")
+
+    def handle(self, *args, **options):
+        event_id = options['event_id']
+        if not Event.objects.filter(pk=event_id).exists():
+            raise CommandError(f"El evento {event_id} no existe.")
+
+        desk = CheckInDesk(
+            event_id,
+            flush_size=getattr(settings, 'EVENTS_CHECKIN_FLUSH_SIZE', 200),
+            flush_interval=getattr(settings, 'EVENTS_CHECKIN_FLUSH_INTERVAL', 2),
+        )
+        tokens = options['tokens'] or (line.strip() for line in sys.stdin)
+        accepted = rejected = 0
+        try:
+            for token in tokens:
+                if not token:
+                    continue
+                result = desk.scan(token)
+                if result.accepted:
+                    accepted += 1
+                    self.stdout.write(self.style.SUCCESS(f"{result.message} (usuario {result.user_id})"))
+                else:
+                    rejected += 1
+                    self.stdout.write(self.style.ERROR(f"{result.message}: {token}"))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            desk.flush()
+
+        self.stdout.write(f"Aceptadas: {accepted} | Rechazadas: {rejected}")
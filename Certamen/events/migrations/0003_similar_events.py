@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_event_image_base64_event_is_featured'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='similar_stale',
+            field=models.BooleanField(db_index=True, default=True, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SimilarEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_events', to='events.event')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='events.event')),
+            ],
+            options={
+                'ordering': ['event', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('event', 'rank'), name='unique_similar_event_rank')],
+            },
+        ),
+    ]
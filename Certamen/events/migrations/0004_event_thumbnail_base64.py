@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_similar_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='thumbnail_base64',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_event_date_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEvent',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('event_name', models.CharField(max_length=254, verbose_name='Name of the event')),
+                ('pub_date', models.DateTimeField(verbose_name='Date published')),
+                ('event_date', models.DateField(verbose_name='Event date')),
+                ('starts_at', models.TimeField(verbose_name='Start time of event')),
+                ('ends_at', models.TimeField(verbose_name='End time of event')),
+                ('location', models.CharField(max_length=254)),
+                ('description', models.CharField(max_length=254)),
+                ('price', models.IntegerField()),
+                ('capacity', models.PositiveIntegerField(blank=True, null=True)),
+                ('is_featured', models.BooleanField(default=False, verbose_name='Evento Destacado')),
+                ('image_base64', models.TextField(blank=True, null=True, verbose_name='Imagen del Evento')),
+                ('thumbnail_base64', models.TextField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archivado')),
+                ('attendees', models.ManyToManyField(blank=True, related_name='archived_events_attended', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'evento archivado',
+                'verbose_name_plural': 'eventos archivados',
+                'indexes': [models.Index(fields=['event_date', 'id'], name='archived_event_date_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_archived_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='waitlist_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='En lista de espera'),
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='events.event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'lugar en lista de espera',
+                'verbose_name_plural': 'lista de espera',
+                'ordering': ['event', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('event', 'user'), name='unique_waitlist_user'), models.UniqueConstraint(fields=('event', 'position'), name='unique_waitlist_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated manually
+#
+# Convierte el ManyToMany implícito Event.attendees en uno con modelo
+# intermedio explícito (Attendance) sin tocar la base de datos: el modelo
+# reutiliza la tabla events_event_attendees que ya existe.
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_waitlist'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Attendance',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendances', to='events.event')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendances', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'verbose_name': 'asistencia',
+                        'verbose_name_plural': 'asistencias',
+                        'db_table': 'events_event_attendees',
+                        'unique_together': {('event', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='event',
+                    name='attendees',
+                    field=models.ManyToManyField(blank=True, related_name='events_attending', through='events.Attendance', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+            database_operations=[],
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated manually
+#
+# Columnas nuevas con valor por defecto en la base de datos: el código que
+# aún inserta sólo (event_id, user_id) sigue funcionando durante el despliegue.
+#
+# AddField en SQLite reconstruye la tabla completa (CREATE new__ / INSERT ...
+# SELECT / DROP / RENAME) para columnas NOT NULL con default y para defaults
+# no constantes como Now(), bloqueando la escritura mientras copia. Por eso la
+# base de datos se modifica con ALTER TABLE ... ADD COLUMN, que sólo cambia el
+# esquema. SQLite no acepta un default no constante en ADD COLUMN: joined_at
+# se agrega sin NOT NULL y la 0010 completa las filas existentes.
+import django.db.models.functions.datetime
+import django.utils.timezone
+from django.db import migrations, models
+
+TABLE = 'events_event_attendees'
+
+
+def add_column(name, definition):
+    return migrations.RunSQL(
+        f'ALTER TABLE "{TABLE}" ADD COLUMN "{name}" {definition}',
+        reverse_sql=f'ALTER TABLE "{TABLE}" DROP COLUMN "{name}"',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_attendance_through'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='attendance',
+                    name='joined_at',
+                    field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), default=django.utils.timezone.now, verbose_name='Inscrito el'),
+                ),
+                migrations.AddField(
+                    model_name='attendance',
+                    name='status',
+                    field=models.CharField(choices=[('confirmed', 'Confirmada'), ('cancelled', 'Cancelada')], db_default='confirmed', default='confirmed', max_length=10, verbose_name='Estado'),
+                ),
+                migrations.AddField(
+                    model_name='attendance',
+                    name='price_paid',
+                    field=models.IntegerField(db_default=0, default=0, verbose_name='Precio pagado'),
+                ),
+                migrations.AddField(
+                    model_name='attendance',
+                    name='event_date',
+                    field=models.DateField(blank=True, editable=False, null=True),
+                ),
+            ],
+            database_operations=[
+                add_column('joined_at', 'datetime NULL'),
+                add_column('status', "varchar(10) DEFAULT 'confirmed' NOT NULL"),
+                add_column('price_paid', 'integer DEFAULT 0 NOT NULL'),
+                add_column('event_date', 'date NULL'),
+            ],
+        ),
+    ]
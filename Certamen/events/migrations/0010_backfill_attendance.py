@@ -0,0 +1,47 @@
+# Generated manually
+#
+# Completa las columnas nuevas de las asistencias existentes por lotes, cada
+# uno en su propia transacción, para no bloquear la tabla de una sola vez.
+# joined_at se agregó sin NOT NULL (ver 0009): aquí se llena en todas las filas.
+from django.db import migrations, transaction
+from django.db.models import OuterRef, Q, Subquery
+
+BATCH_SIZE = 1000
+
+
+def backfill_attendance(apps, schema_editor):
+    Attendance = apps.get_model('events', 'Attendance')
+    Event = apps.get_model('events', 'Event')
+    event = Event.objects.filter(pk=OuterRef('event_id'))
+
+    last_pk = 0
+    while True:
+        pks = list(
+            Attendance.objects
+            .filter(Q(event_date__isnull=True) | Q(joined_at__isnull=True), pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not pks:
+            break
+        with transaction.atomic():
+            # La hora real de inscripción no se guardaba: se usa la publicación del evento
+            Attendance.objects.filter(pk__in=pks).update(
+                event_date=Subquery(event.values('event_date')[:1]),
+                price_paid=Subquery(event.values('price')[:1]),
+                joined_at=Subquery(event.values('pub_date')[:1]),
+            )
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('events', '0009_attendance_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_attendance, migrations.RunPython.noop),
+    ]
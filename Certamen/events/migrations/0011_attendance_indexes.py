@@ -0,0 +1,20 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_backfill_attendance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['event', 'joined_at'], name='attendance_event_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['user', 'event_date'], name='attendance_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated manually
+#
+# Da a ArchivedEvent.attendees un modelo intermedio (ArchivedAttendance) con
+# las mismas columnas que Attendance. Como en 0008, el modelo reutiliza la
+# tabla del ManyToMany implícito; luego se renombra la columna del evento, se
+# agregan las columnas nuevas y se completa la fecha de las filas existentes
+# (que sólo eran asistencias confirmadas).
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_archived_attendance(apps, schema_editor):
+    ArchivedAttendance = apps.get_model('events', 'ArchivedAttendance')
+    ArchivedEvent = apps.get_model('events', 'ArchivedEvent')
+    event = ArchivedEvent.objects.filter(pk=OuterRef('event_id'))
+    ArchivedAttendance.objects.filter(event_date__isnull=True).update(
+        event_date=Subquery(event.values('event_date')[:1]),
+        price_paid=Subquery(event.values('price')[:1]),
+        joined_at=Subquery(event.values('pub_date')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0012_checkinlog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ArchivedAttendance',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('event', models.ForeignKey(db_column='archivedevent_id', on_delete=django.db.models.deletion.CASCADE, related_name='attendances', to='events.archivedevent')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_attendances', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'verbose_name': 'asistencia archivada',
+                        'verbose_name_plural': 'asistencias archivadas',
+                        'db_table': 'events_archivedevent_attendees',
+                        'unique_together': {('event', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='archivedevent',
+                    name='attendees',
+                    field=models.ManyToManyField(blank=True, related_name='archived_events_attended', through='events.ArchivedAttendance', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AlterField(
+            model_name='archivedattendance',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendances', to='events.archivedevent'),
+        ),
+        migrations.AddField(
+            model_name='archivedattendance',
+            name='joined_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Inscrito el'),
+        ),
+        migrations.AddField(
+            model_name='archivedattendance',
+            name='status',
+            field=models.CharField(choices=[('confirmed', 'Confirmada'), ('cancelled', 'Cancelada')], default='confirmed', max_length=10, verbose_name='Estado'),
+        ),
+        migrations.AddField(
+            model_name='archivedattendance',
+            name='price_paid',
+            field=models.IntegerField(default=0, verbose_name='Precio pagado'),
+        ),
+        migrations.AddField(
+            model_name='archivedattendance',
+            name='event_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_archived_attendance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0014_archived_checkin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarVersion',
+            fields=[
+                ('key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(db_index=True)),
+            ],
+        ),
+    ]
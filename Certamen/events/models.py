@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.db.models.functions import Now
+from django.utils import timezone
 
 
 class Event(models.Model):
@@ -19,7 +21,8 @@ class Event(models.Model):
   attendees = models.ManyToManyField(
     settings.AUTH_USER_MODEL,
     related_name='events_attending',
-    blank=True
+    blank=True,
+    through='Attendance'
   )
   
   is_featured = models.BooleanField(
@@ -33,22 +36,41 @@ class Event(models.Model):
     null=True,
     help_text="Imagen en formato base64"
   )
+  # Contador de la lista de espera, mantenido por events.services
+  waitlist_count = models.PositiveIntegerField("En lista de espera", default=0, editable=False)
+  # Miniatura generada en segundo plano (tarea events.generate_thumbnail)
+  thumbnail_base64 = models.TextField(blank=True, null=True, editable=False)
+  # Marca los eventos cuya asistencia cambió desde el último cálculo de similares
+  similar_stale = models.BooleanField(default=True, db_index=True, editable=False)
+
+  class Meta:
+    indexes = [
+      # Listados por fecha y cursores (event_date, id) de la API
+      models.Index(fields=['event_date', 'id'], name='event_date_id_idx'),
+    ]
 
   def __str__(self):
     return self.event_name
 
+  @property
+  def attendee_count(self):
+    # Los listados lo anotan con confirmed_attendees_count() para evitar una consulta por evento
+    if hasattr(self, 'confirmed_count'):
+        return self.confirmed_count
+    return self.attendances.confirmed().count()
+
   @property
   def remaining_slots(self):
     if self.capacity is None:
         return None  # ilimitado
-    used = self.attendees.count()
+    used = self.attendee_count
     return max(0, self.capacity - used)
 
   def clean(self):
     # Evita guardar una capacidad menor a los asistentes actuales
     # Solo valida si el evento ya existe (tiene pk) porque attendees es ManyToMany
     if self.pk and self.capacity is not None:
-        if self.attendees.exists() and self.capacity < self.attendees.count():
+        if self.capacity < self.attendances.confirmed().count():
             raise ValidationError(
                 {"capacity": "La capacidad no puede ser menor al número actual de asistentes."}
             )
@@ -68,5 +90,203 @@ class Event(models.Model):
     if self.is_featured:
         Event.objects.filter(is_featured=True).exclude(pk=self.pk).update(is_featured=False)
     super().save(*args, **kwargs)
+    # Mantiene la fecha copiada en las asistencias (índice por usuario y fecha)
+    self.attendances.exclude(event_date=self.event_date).update(event_date=self.event_date)
+
+
+class AttendanceQuerySet(models.QuerySet):
+  def confirmed(self):
+    return self.filter(status=Attendance.CONFIRMED)
+
+
+def confirmed_attendees_count():
+  """Anotación con la cantidad de asistentes confirmados de cada evento"""
+  return models.Count('attendances', filter=models.Q(attendances__status=Attendance.CONFIRMED))
+
+
+class Attendance(models.Model):
+  """Inscripción de un usuario a un evento (tabla intermedia de Event.attendees)"""
+  CONFIRMED = 'confirmed'
+  CANCELLED = 'cancelled'
+  STATUS_CHOICES = [
+    (CONFIRMED, 'Confirmada'),
+    (CANCELLED, 'Cancelada'),
+  ]
+
+  event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='attendances')
+  user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='attendances')
+  # db_default: filas insertadas sin estas columnas (p. ej. código anterior durante un despliegue).
+  # En SQLite joined_at no tiene default en la tabla (ver migración 0009)
+  joined_at = models.DateTimeField("Inscrito el", default=timezone.now, db_default=Now())
+  status = models.CharField(
+    "Estado", max_length=10, choices=STATUS_CHOICES, default=CONFIRMED, db_default=CONFIRMED
+  )
+  price_paid = models.IntegerField("Precio pagado", default=0, db_default=0)
+  # Copia de Event.event_date para recorrer los eventos de un usuario por fecha con un índice
+  event_date = models.DateField(null=True, blank=True, editable=False)
+
+  objects = AttendanceQuerySet.as_manager()
+
+  class Meta:
+    # Reutiliza la tabla que Django creó para el ManyToMany implícito
+    db_table = 'events_event_attendees'
+    unique_together = [('event', 'user')]
+    verbose_name = "asistencia"
+    verbose_name_plural = "asistencias"
+    indexes = [
+      models.Index(fields=['event', 'joined_at'], name='attendance_event_joined_idx'),
+      models.Index(fields=['user', 'event_date'], name='attendance_user_date_idx'),
+    ]
+
+  def __str__(self):
+    return f"{self.user_id} -> {self.event_id} ({self.status})"
+
+  def save(self, *args, **kwargs):
+    if self.event_date is None:
+        self.event_date = self.event.event_date
+    super().save(*args, **kwargs)
+
+
+class CalendarVersion(models.Model):
+  """Versión de un feed .ics (`events.ical`): el ETag y el Last-Modified salen de aquí"""
+  key = models.CharField(max_length=40, primary_key=True)
+  # Segundos enteros, mayores que cualquier versión anterior (ver ical.touch)
+  version = models.BigIntegerField(db_index=True)
+
+  def __str__(self):
+    return f"{self.key} @ {self.version}"
+
+
+class SimilarEvent(models.Model):
+  """Recomendación precalculada: quienes asistieron a `event` también asistieron a `similar`"""
+  event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='similar_events')
+  similar = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='similar_to')
+  score = models.FloatField()
+  rank = models.PositiveSmallIntegerField()
+
+  class Meta:
+    ordering = ['event', 'rank']
+    constraints = [
+      models.UniqueConstraint(fields=['event', 'rank'], name='unique_similar_event_rank'),
+    ]
+
+  def __str__(self):
+    return f"{self.event_id} -> {self.similar_id} ({self.score:.3f})"
+
+
+class WaitlistEntry(models.Model):
+  """Lugar en la lista de espera de un evento completo (FIFO por `position`)"""
+  event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist_entries')
+  user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='waitlist_entries')
+  position = models.PositiveIntegerField()
+  created_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    ordering = ['event', 'position']
+    verbose_name = "lugar en lista de espera"
+    verbose_name_plural = "lista de espera"
+    constraints = [
+      models.UniqueConstraint(fields=['event', 'user'], name='unique_waitlist_user'),
+      # También es el índice de la fila: siguiente en ser promovido y lugar de cada usuario
+      models.UniqueConstraint(fields=['event', 'position'], name='unique_waitlist_position'),
+    ]
+
+  def __str__(self):
+    return f"{self.event_id} #{self.position} ({self.user_id})"
 
 
+class CheckInLog(models.Model):
+  """Entrada validada en la puerta (se escribe por lotes desde `events.checkin`)"""
+  event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='check_ins')
+  user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='check_ins')
+  attendance = models.ForeignKey(Attendance, on_delete=models.SET_NULL, null=True, related_name='check_ins')
+  checked_in_at = models.DateTimeField(default=timezone.now)
+
+  class Meta:
+    ordering = ['event', 'checked_in_at']
+    verbose_name = "ingreso"
+    verbose_name_plural = "ingresos"
+    constraints = [
+      # Una persona entra una sola vez; también es el índice para cargar los ya ingresados
+      models.UniqueConstraint(fields=['event', 'user'], name='unique_checkin_user'),
+    ]
+
+  def __str__(self):
+    return f"{self.event_id} ({self.user_id}) {self.checked_in_at:%H:%M:%S}"
+
+
+class ArchivedEvent(models.Model):
+  """Evento ya realizado, movido fuera de la tabla principal por `archive_events`"""
+  # Conserva el id original del evento
+  id = models.BigIntegerField(primary_key=True)
+  event_name = models.CharField("Name of the event", max_length=254)
+  pub_date = models.DateTimeField("Date published")
+  event_date = models.DateField("Event date")
+  starts_at = models.TimeField("Start time of event")
+  ends_at = models.TimeField("End time of event")
+  location = models.CharField(max_length=254)
+  description = models.CharField(max_length=254)
+  price = models.IntegerField()
+  capacity = models.PositiveIntegerField(null=True, blank=True)
+  is_featured = models.BooleanField("Evento Destacado", default=False)
+  image_base64 = models.TextField("Imagen del Evento", blank=True, null=True)
+  thumbnail_base64 = models.TextField(blank=True, null=True)
+  attendees = models.ManyToManyField(
+    settings.AUTH_USER_MODEL,
+    related_name='archived_events_attended',
+    blank=True,
+    through='ArchivedAttendance'
+  )
+  archived_at = models.DateTimeField("Archivado", auto_now_add=True)
+
+  class Meta:
+    verbose_name = "evento archivado"
+    verbose_name_plural = "eventos archivados"
+    indexes = [
+      models.Index(fields=['event_date', 'id'], name='archived_event_date_id_idx'),
+    ]
+
+  def __str__(self):
+    return self.event_name
+
+
+class ArchivedAttendance(models.Model):
+  """Asistencia de un evento archivado: copia de `Attendance`, incluidas las canceladas"""
+  event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name='attendances')
+  user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_attendances')
+  joined_at = models.DateTimeField("Inscrito el", default=timezone.now)
+  status = models.CharField(
+    "Estado", max_length=10, choices=Attendance.STATUS_CHOICES, default=Attendance.CONFIRMED
+  )
+  price_paid = models.IntegerField("Precio pagado", default=0)
+  event_date = models.DateField(null=True, blank=True, editable=False)
+
+  objects = AttendanceQuerySet.as_manager()
+
+  class Meta:
+    # Reutiliza la tabla que Django creó para el ManyToMany implícito
+    db_table = 'events_archivedevent_attendees'
+    unique_together = [('event', 'user')]
+    verbose_name = "asistencia archivada"
+    verbose_name_plural = "asistencias archivadas"
+
+  def __str__(self):
+    return f"{self.user_id} -> {self.event_id} ({self.status})"
+
+
+class ArchivedCheckIn(models.Model):
+  """Ingreso de un evento archivado: copia de `CheckInLog`"""
+  event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name='check_ins')
+  user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_check_ins')
+  checked_in_at = models.DateTimeField()
+
+  class Meta:
+    ordering = ['event', 'checked_in_at']
+    verbose_name = "ingreso archivado"
+    verbose_name_plural = "ingresos archivados"
+    constraints = [
+      models.UniqueConstraint(fields=['event', 'user'], name='unique_archived_checkin_user'),
+    ]
+
+  def __str__(self):
+    return f"{self.event_id} ({self.user_id}) {self.checked_in_at:%H:%M:%S}"
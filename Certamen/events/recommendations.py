@@ -0,0 +1,181 @@
+# apps/events/recommendations.py
+"""
+Cálculo por lotes de "quienes asistieron a esto también asistieron a...".
+
+La matriz evento x usuario se arma de forma dispersa (un set de usuarios por
+evento y un set de eventos por usuario) leyendo las asistencias confirmadas
+de `Attendance` por bloques. La similitud entre eventos es el coseno de sus
+vectores binarios de asistencia:
+
+    sim(a, b) = |A ∩ B| / sqrt(|A| * |B|)
+
+Sólo se recalculan los eventos marcados con `similar_stale` y los que
+compartían o comparten asistentes con ellos, y sólo se cargan en memoria las
+asistencias de los usuarios de esos eventos; el tamaño de los demás eventos
+se cuenta en la base de datos.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import Attendance, Event, SimilarEvent
+
+DEFAULT_TOP_K = 5
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _confirmed_pairs(chunk_size, field=None, ids=()):
+    """(event_id, user_id) de las asistencias confirmadas, opcionalmente con `field` en `ids`"""
+    queryset = Attendance.objects.confirmed().values_list('event_id', 'user_id')
+    if field is None:
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+    ids = sorted(ids)
+    for start in range(0, len(ids), chunk_size):
+        batch = ids[start:start + chunk_size]
+        yield from queryset.filter(**{f'{field}__in': batch}).iterator(chunk_size=chunk_size)
+
+
+def _load_attendance(pairs):
+    """Índices dispersos a partir de pares (evento, usuario)"""
+    users_by_event = defaultdict(set)
+    events_by_user = defaultdict(set)
+    for event_id, user_id in pairs:
+        users_by_event[event_id].add(user_id)
+        events_by_user[user_id].add(event_id)
+    return users_by_event, events_by_user
+
+
+def _event_sizes(event_ids, chunk_size):
+    """Asistentes confirmados de cada evento, contados en la base de datos"""
+    sizes = {}
+    event_ids = sorted(event_ids)
+    for start in range(0, len(event_ids), chunk_size):
+        sizes.update(
+            Attendance.objects.confirmed()
+            .filter(event_id__in=event_ids[start:start + chunk_size])
+            .order_by()
+            .values_list('event_id')
+            .annotate(size=Count('pk'))
+        )
+    return sizes
+
+
+def _top_similar(event_id, users_by_event, events_by_user, sizes, top_k):
+    """Top-K eventos similares a `event_id` según similitud coseno"""
+    attendees = users_by_event.get(event_id)
+    if not attendees:
+        return []
+
+    # Producto de la fila del evento contra la matriz: co-asistencias por evento
+    co_counts = Counter()
+    for user_id in attendees:
+        co_counts.update(events_by_user[user_id])
+    co_counts.pop(event_id, None)
+
+    size = len(attendees)
+    scores = (
+        (shared / math.sqrt(size * sizes[other]), other)
+        for other, shared in co_counts.items()
+    )
+    # Empates: gana el evento con id menor para que el resultado sea estable
+    return heapq.nsmallest(top_k, scores, key=lambda item: (-item[0], item[1]))
+
+
+def _affected_events(stale_ids, chunk_size):
+    """Eventos cuyo top-K puede cambiar cuando cambia la asistencia de `stale_ids`"""
+    stale_users = {user_id for _, user_id in _confirmed_pairs(chunk_size, 'event_id', stale_ids)}
+    affected = set(stale_ids)
+    affected.update(event_id for event_id, _ in _confirmed_pairs(chunk_size, 'user_id', stale_users))
+    # Los que antes recomendaban un evento modificado también deben recalcularse
+    affected.update(
+        SimilarEvent.objects
+        .filter(similar_id__in=stale_ids)
+        .values_list('event_id', flat=True)
+    )
+    return affected
+
+
+def build_similar_events(full=False, top_k=DEFAULT_TOP_K, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Recalcula la tabla `SimilarEvent`.
+
+    Con `full=False` sólo procesa los eventos afectados por cambios de
+    asistencia. Devuelve la cantidad de eventos recalculados.
+    """
+    if full:
+        stale_ids = set(Event.objects.values_list('pk', flat=True))
+    else:
+        stale_ids = set(Event.objects.filter(similar_stale=True).values_list('pk', flat=True))
+    if not stale_ids:
+        return 0
+
+    # Se desmarcan antes de leer: lo que cambie durante el cálculo queda para la próxima corrida
+    stale_events = Event.objects.all() if full else Event.objects.filter(pk__in=stale_ids)
+    stale_events.update(similar_stale=False)
+    try:
+        return _rebuild(stale_ids, full, top_k, chunk_size)
+    except Exception:
+        stale_events.update(similar_stale=True)
+        raise
+
+
+def _rebuild(stale_ids, full, top_k, chunk_size):
+    if full:
+        targets = stale_ids
+        users_by_event, events_by_user = _load_attendance(_confirmed_pairs(chunk_size))
+        sizes = {event_id: len(users) for event_id, users in users_by_event.items()}
+    else:
+        # Sólo se carga el vecindario: los asistentes de los eventos a recalcular
+        # y los demás eventos de esos asistentes
+        targets = _affected_events(stale_ids, chunk_size)
+        target_users = {user_id for _, user_id in _confirmed_pairs(chunk_size, 'event_id', targets)}
+        users_by_event, events_by_user = _load_attendance(
+            _confirmed_pairs(chunk_size, 'user_id', target_users)
+        )
+        # Los eventos vecinos pueden tener asistentes fuera del vecindario
+        sizes = _event_sizes(users_by_event, chunk_size)
+    # Sólo eventos que aún existen
+    targets = sorted(Event.objects.filter(pk__in=targets).values_list('pk', flat=True))
+
+    for start in range(0, len(targets), chunk_size):
+        chunk = targets[start:start + chunk_size]
+        rows = [
+            SimilarEvent(event_id=event_id, similar_id=other, score=score, rank=rank)
+            for event_id in chunk
+            for rank, (score, other) in enumerate(
+                _top_similar(event_id, users_by_event, events_by_user, sizes, top_k), start=1
+            )
+        ]
+        with transaction.atomic():
+            SimilarEvent.objects.filter(event_id__in=chunk).delete()
+            SimilarEvent.objects.bulk_create(rows, batch_size=chunk_size)
+    return len(targets)
+
+
+def similar_events_for(event_id):
+    """Eventos similares a uno dado, en una sola consulta por índice"""
+    return (
+        Event.objects
+        .filter(similar_to__event_id=event_id)
+        .defer('image_base64')
+        .order_by('similar_to__rank')
+    )
+
+
+def recommended_events_for_user(user, limit=DEFAULT_TOP_K):
+    """Eventos recomendados según los eventos a los que asiste el usuario"""
+    return (
+        Event.objects
+        .filter(
+            similar_to__event__attendances__user=user,
+            similar_to__event__attendances__status=Attendance.CONFIRMED,
+        )
+        .exclude(pk__in=Attendance.objects.confirmed().filter(user=user).values('event_id'))
+        .defer('image_base64')
+        .annotate(recommendation_score=Sum('similar_to__score'))
+        .order_by('-recommendation_score', 'event_date')[:limit]
+    )
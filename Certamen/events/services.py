@@ -1,7 +1,45 @@
 # apps/events/services.py
 from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Subquery
 from django.core.exceptions import ValidationError
-from .models import Event
+from django.utils import timezone
+from .ical import touch_users
+from .models import Attendance, Event, WaitlistEntry
+from .live import seat_hub, seats_payload
+from .tasks import send_join_confirmation
+
+
+def _publish_seats(event, attendees):
+    # Se publica sólo si la transacción se confirma
+    payload = seats_payload(event.pk, event.capacity, attendees)
+    transaction.on_commit(lambda: seat_hub.publish(payload))
+
+
+def _confirm_attendance(event, user_id):
+    """Crea la asistencia o reactiva una cancelada"""
+    reactivated = (
+        Attendance.objects
+        .filter(event=event, user_id=user_id, status=Attendance.CANCELLED)
+        .update(
+            status=Attendance.CONFIRMED,
+            joined_at=timezone.now(),
+            price_paid=event.price,
+            event_date=event.event_date,
+        )
+    )
+    if reactivated:
+        _attendance_updated(event, user_id)
+    else:
+        Attendance.objects.create(
+            event=event, user_id=user_id, price_paid=event.price, event_date=event.event_date
+        )
+
+
+def _attendance_updated(event, user_id):
+    # update() no emite post_save: se hace a mano lo que hacen las señales de Attendance
+    Event.objects.filter(pk=event.pk).update(similar_stale=True)
+    touch_users([user_id])
+
 
 @transaction.atomic
 def join_event(event_id, user_id):
@@ -9,12 +47,162 @@ def join_event(event_id, user_id):
     event = Event.objects.select_for_update().get(pk=event_id)
 
     # Ya inscrito: no cuenta doble y no rompe la capacidad
-    if event.attendees.filter(pk=user_id).exists():
+    if event.attendances.confirmed().filter(user_id=user_id).exists():
         return event  # idempotente
 
     # Chequea capacidad restante
-    if event.capacity is not None and event.attendees.count() >= event.capacity:
+    attendees = event.attendances.confirmed().count()
+    if event.capacity is not None and attendees >= event.capacity:
         raise ValidationError("No quedan plazas disponibles para este evento.")
 
-    event.attendees.add(user_id)
+    _confirm_attendance(event, user_id)
+    # Si estaba en la lista de espera, deja de estarlo
+    if event.waitlist_count:
+        _remove_from_waitlist(event, user_id)
+    _publish_seats(event, attendees + 1)
     return event
+
+
+@transaction.atomic
+def leave_event(event_id, user_id):
+    """Cancela la inscripción del usuario; retorna (evento, si estaba inscrito)"""
+    event = Event.objects.select_for_update().get(pk=event_id)
+
+    # Se conserva la fila como cancelada (historial de cancelaciones)
+    cancelled = event.attendances.confirmed().filter(user_id=user_id).update(
+        status=Attendance.CANCELLED
+    )
+    if not cancelled:
+        return event, False
+    _attendance_updated(event, user_id)
+
+    _publish_seats(event, _promote_waitlist(event))
+    return event, True
+
+
+def _remove_from_waitlist(event, user_id):
+    deleted, _ = WaitlistEntry.objects.filter(event=event, user_id=user_id).delete()
+    if deleted:
+        Event.objects.filter(pk=event.pk).update(waitlist_count=F('waitlist_count') - deleted)
+    return bool(deleted)
+
+
+def _promote_waitlist(event):
+    """
+    Inscribe a los primeros de la lista de espera mientras haya plazas.
+
+    Debe llamarse dentro de una transacción con la fila del evento bloqueada.
+    Retorna la cantidad de asistentes resultante.
+    """
+    attendees = event.attendances.confirmed().count()
+    if not event.waitlist_count:
+        return attendees
+    # Quien ya está inscrito (p. ej. agregado desde el admin) sale de la fila sin ocupar plaza
+    confirmed = Attendance.objects.confirmed().filter(event=event, user_id=OuterRef('user_id'))
+    already, _ = WaitlistEntry.objects.filter(event=event).filter(Exists(confirmed)).delete()
+    if already:
+        Event.objects.filter(pk=event.pk).update(waitlist_count=F('waitlist_count') - already)
+    free = None if event.capacity is None else event.capacity - attendees
+    if free is not None and free <= 0:
+        return attendees
+
+    entries = WaitlistEntry.objects.filter(event=event).order_by('position')
+    if free is not None:
+        entries = entries[:free]
+    promoted = list(entries.values_list('pk', 'user_id'))
+    if not promoted:
+        return attendees
+
+    user_ids = [user_id for _, user_id in promoted]
+    for user_id in user_ids:
+        _confirm_attendance(event, user_id)
+    WaitlistEntry.objects.filter(pk__in=[pk for pk, _ in promoted]).delete()
+    Event.objects.filter(pk=event.pk).update(waitlist_count=F('waitlist_count') - len(promoted))
+    for user_id in user_ids:
+        send_join_confirmation.delay(event_id=event.pk, user_id=user_id)
+    return attendees + len(promoted)
+
+
+@transaction.atomic
+def promote_waitlist(event_id):
+    """Promueve la lista de espera tras liberar plazas (p. ej. desde el admin)"""
+    event = Event.objects.select_for_update().get(pk=event_id)
+    _publish_seats(event, _promote_waitlist(event))
+    return event
+
+
+@transaction.atomic
+def join_waitlist(event_id, user_id):
+    """Agrega al usuario al final de la lista de espera; retorna su entrada"""
+    event = Event.objects.select_for_update().get(pk=event_id)
+
+    attendees = event.attendances.confirmed()
+    if attendees.filter(user_id=user_id).exists():
+        raise ValidationError("Ya estás inscrito en este evento.")
+
+    entry = WaitlistEntry.objects.filter(event=event, user_id=user_id).first()
+    if entry is not None:
+        return entry  # idempotente
+
+    if event.capacity is None or attendees.count() < event.capacity:
+        raise ValidationError("Aún quedan plazas disponibles, puedes inscribirte directamente.")
+
+    last = WaitlistEntry.objects.filter(event=event).aggregate(last=Max('position'))['last'] or 0
+    entry = WaitlistEntry.objects.create(event=event, user_id=user_id, position=last + 1)
+    Event.objects.filter(pk=event.pk).update(waitlist_count=F('waitlist_count') + 1)
+    return entry
+
+
+@transaction.atomic
+def leave_waitlist(event_id, user_id):
+    """Saca al usuario de la lista de espera; retorna si estaba en ella"""
+    event = Event.objects.select_for_update().get(pk=event_id)
+    return _remove_from_waitlist(event, user_id)
+
+
+def waitlist_position(event_id, user_id):
+    """Lugar del usuario en la fila (1 = el siguiente), o None si no está"""
+    position = (
+        WaitlistEntry.objects
+        .filter(event_id=event_id, user_id=user_id)
+        .values_list('position', flat=True)
+        .first()
+    )
+    if position is None:
+        return None
+    # Conteo sobre el índice (event, position), no sobre toda la tabla
+    return WaitlistEntry.objects.filter(event_id=event_id, position__lt=position).count() + 1
+
+
+def user_waitlist(user):
+    """Listas de espera del usuario con su lugar en cada una, en una sola consulta"""
+    ahead = (
+        WaitlistEntry.objects
+        .filter(event=OuterRef('event'), position__lte=OuterRef('position'))
+        .values('event')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    return (
+        WaitlistEntry.objects
+        .filter(user=user)
+        .select_related('event')
+        .defer('event__image_base64', 'event__thumbnail_base64')
+        .annotate(place=Subquery(ahead))
+        .order_by('event__event_date')
+    )
+
+
+def is_attending(event_id, user_id):
+    return Attendance.objects.confirmed().filter(event_id=event_id, user_id=user_id).exists()
+
+
+def user_events(user):
+    """Eventos confirmados del usuario por fecha: recorre el índice (user, event_date)"""
+    return (
+        Event.objects
+        .filter(attendances__user=user, attendances__status=Attendance.CONFIRMED)
+        .annotate(attendance_id=F('attendances__id'))
+        .defer('image_base64', 'thumbnail_base64')
+        .order_by('attendances__event_date', 'starts_at')
+    )
@@ -0,0 +1,61 @@
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .ical import touch_events, touch_users
+from .models import Attendance, Event
+
+
+def _mark_similar_stale(event_ids):
+    Event.objects.filter(pk__in=event_ids).update(similar_stale=True)
+
+
+def _copy_event_dates(attendances):
+    # add()/set() crean las filas con bulk_create, sin pasar por Attendance.save()
+    event_date = Event.objects.filter(pk=OuterRef('event_id')).values('event_date')[:1]
+    attendances.filter(event_date__isnull=True).update(event_date=Subquery(event_date))
+
+
+def _touch_calendars(user_ids):
+    # En la misma transacción que el cambio: un feed nunca ve la versión nueva con datos viejos
+    touch_users(user_ids)
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def attendance_changed(sender, instance, **kwargs):
+    """Marca el evento para el próximo cálculo de similares e invalida el feed del usuario"""
+    _mark_similar_stale([instance.event_id])
+    _touch_calendars([instance.user_id])
+
+
+@receiver(m2m_changed, sender=Event.attendees.through)
+def attendees_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Igual que arriba para cambios hechos con event.attendees.add()/remove()"""
+    if action == 'post_add' and pk_set:
+        if reverse:
+            _copy_event_dates(Attendance.objects.filter(user=instance, event_id__in=pk_set))
+        else:
+            _copy_event_dates(Attendance.objects.filter(event=instance, user_id__in=pk_set))
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _mark_similar_stale([instance.pk])
+        if action in ('post_add', 'post_remove') and pk_set:
+            _touch_calendars(pk_set)
+        elif action == 'pre_clear':
+            _touch_calendars(instance.attendances.values_list('user_id', flat=True))
+        return
+    if action in ('post_add', 'post_remove') and pk_set:
+        _mark_similar_stale(pk_set)
+    elif action == 'pre_clear':
+        # user.events_attending.clear(): se marcan antes de perder la relación
+        Event.objects.filter(attendances__user=instance).update(similar_stale=True)
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _touch_calendars([instance.pk])
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def event_changed(sender, **kwargs):
+    """Invalida los feeds .ics (todos incluyen datos de eventos)"""
+    touch_events()
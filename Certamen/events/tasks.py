@@ -0,0 +1,71 @@
+# apps/events/tasks.py
+import base64
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from PIL import Image
+
+from tasks.queue import task
+from .models import Attendance, Event, WaitlistEntry
+
+THUMBNAIL_SIZE = (120, 120)
+
+
+@task('events.generate_thumbnail')
+def generate_thumbnail(event_id):
+    """Genera la miniatura del evento a partir de la imagen en base64"""
+    event = Event.objects.only('image_base64').filter(pk=event_id).first()
+    if event is None or not event.image_base64:
+        Event.objects.filter(pk=event_id).update(thumbnail_base64=None)
+        return
+
+    # Formato: data:<mime>;base64,<datos>
+    _, _, data = event.image_base64.partition(',')
+    image = Image.open(io.BytesIO(base64.b64decode(data)))
+    image.thumbnail(THUMBNAIL_SIZE)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=80)
+    thumbnail = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    Event.objects.filter(pk=event_id).update(thumbnail_base64=f"data:image/jpeg;base64,{thumbnail}")
+
+
+@task('events.send_join_confirmation')
+def send_join_confirmation(event_id, user_id):
+    """Envía el correo de confirmación de inscripción"""
+    event = Event.objects.defer('image_base64', 'thumbnail_base64').filter(pk=event_id).first()
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if event is None or user is None or not user.email:
+        return
+    if not Attendance.objects.confirmed().filter(event=event, user_id=user_id).exists():
+        return  # se desinscribió antes de que corriera la tarea
+
+    send_mail(
+        f'Inscripción confirmada: {event.event_name}',
+        f'Hola {user.first_name or user.username},\n\n'
+        f'Te has inscrito en "{event.event_name}". '
+        f'Nos vemos el {event.event_date.strftime("%d/%m/%Y")} a las {event.starts_at.strftime("%H:%M")} '
+        f'en {event.location}.\n',
+        None,
+        [user.email],
+    )
+
+
+@task('events.reconcile_waitlist_counts')
+def reconcile_waitlist_counts():
+    """Recalcula Event.waitlist_count desde la tabla de la lista de espera"""
+    counts = (
+        WaitlistEntry.objects
+        .filter(event=OuterRef('pk'))
+        .values('event')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    Event.objects.update(
+        waitlist_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+    )
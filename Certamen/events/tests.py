@@ -1,3 +1,677 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import time
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from tasks.models import Task
+
+from . import admission, checkin
+from .admission import AdmissionGate
+from .archive import archive_batch
+from .ical import feed_token, feed_validators, touch_events, touch_users
+from .live import seat_hub, seats_payload
+from .models import (
+    ArchivedAttendance, ArchivedCheckIn, ArchivedEvent, Attendance, CheckInLog, Event, SimilarEvent,
+    WaitlistEntry,
+)
+from .recommendations import build_similar_events, recommended_events_for_user
+from .services import join_event, leave_event, promote_waitlist, user_events
+from .tasks import reconcile_waitlist_counts
+from .tickets import make_ticket
+
+
+def make_event(name, **fields):
+    values = {
+        'event_name': name,
+        'pub_date': timezone.now(),
+        'event_date': datetime.date(2030, 1, 1),
+        'starts_at': datetime.time(10),
+        'ends_at': datetime.time(12),
+        'location': 'Sala 1',
+        'description': 'Descripción',
+        'price': 0,
+    }
+    values.update(fields)
+    return Event.objects.create(**values)
+
+
+def make_users(count, prefix='user'):
+    return [User.objects.create_user(f'{prefix}{i}', email=f'{prefix}{i}@example.com') for i in range(count)]
+
+
+class SimilarEventsTests(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c = make_event('A'), make_event('B'), make_event('C')
+        self.users = make_users(4)
+        self.a.attendees.add(*self.users[:3])
+        self.b.attendees.add(*self.users[:2])
+        self.c.attendees.add(self.users[3])
+
+    def similar_ids(self, event):
+        return list(SimilarEvent.objects.filter(event=event).values_list('similar_id', flat=True))
+
+    def test_full_build_ranks_by_co_attendance(self):
+        self.assertEqual(build_similar_events(), 3)
+        self.assertEqual(self.similar_ids(self.a), [self.b.pk])
+        self.assertEqual(self.similar_ids(self.b), [self.a.pk])
+        self.assertEqual(self.similar_ids(self.c), [])
+        self.assertFalse(Event.objects.filter(similar_stale=True).exists())
+
+    def test_nothing_stale_nothing_rebuilt(self):
+        build_similar_events()
+        self.assertEqual(build_similar_events(), 0)
+
+    def test_incremental_build_matches_full_build(self):
+        build_similar_events()
+        self.users[3].events_attending.add(self.a)
+        self.assertTrue(Event.objects.get(pk=self.a.pk).similar_stale)
+
+        self.assertEqual(build_similar_events(), 3)
+        incremental = list(SimilarEvent.objects.values_list('event_id', 'similar_id', 'rank', 'score'))
+        build_similar_events(full=True)
+        full = list(SimilarEvent.objects.values_list('event_id', 'similar_id', 'rank', 'score'))
+        self.assertEqual(incremental, full)
+
+    def test_incremental_build_leaves_unrelated_events_alone(self):
+        d, e = make_event('D'), make_event('E')
+        others = make_users(2, prefix='other')
+        d.attendees.add(*others)
+        e.attendees.add(*others)
+        build_similar_events()
+        SimilarEvent.objects.filter(event=d).update(score=0.5)
+
+        self.a.attendees.add(self.users[3])
+        self.assertEqual(build_similar_events(), 3)
+        self.assertEqual(SimilarEvent.objects.get(event=d).score, 0.5)
+
+    def test_recommendations_exclude_attended_events(self):
+        self.users[3].events_attending.add(self.a)
+        build_similar_events()
+        recommended = [event.pk for event in recommended_events_for_user(self.users[2])]
+        self.assertEqual(recommended, [self.b.pk, self.c.pk])
+
+    def test_pages_show_recommendations(self):
+        build_similar_events()
+        self.client.force_login(self.users[2])
+        self.assertContains(self.client.get(reverse('event_detail', args=[self.a.pk])), 'también asistieron')
+        self.assertContains(self.client.get(reverse('profile')), 'Te podría interesar')
+
+
+class BackgroundTasksTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com')
+        self.client.force_login(self.admin)
+
+    def upload(self, event):
+        buffer = io.BytesIO()
+        Image.new('RGB', (300, 200)).save(buffer, 'PNG')
+        data = {
+            'event_name': event.event_name, 'event_date': '2030-01-01', 'starts_at': '10:00',
+            'ends_at': '12:00', 'location': event.location, 'description': event.description,
+            'price': 0, 'capacity': '',
+            'image_upload': SimpleUploadedFile('nueva.png', buffer.getvalue(), 'image/png'),
+            'attendances-TOTAL_FORMS': 0, 'attendances-INITIAL_FORMS': 0,
+        }
+        return self.client.post(reverse('admin:events_event_change', args=[event.pk]), data)
+
+    def test_new_image_clears_thumbnail_and_enqueues_task(self):
+        event = make_event('Con miniatura', image_base64='data:image/png;base64,AAAA',
+                           thumbnail_base64='data:image/jpeg;base64,VIEJA')
+        response = self.upload(event)
+        self.assertEqual(response.status_code, 302)
+
+        event.refresh_from_db()
+        self.assertTrue(event.image_base64.startswith('data:image/png;base64,'))
+        self.assertIsNone(event.thumbnail_base64)
+        task_obj = Task.objects.get()
+        self.assertEqual((task_obj.name, task_obj.payload), ('events.generate_thumbnail', {'event_id': event.pk}))
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_join_sends_confirmation(self):
+        user = make_users(1)[0]
+        event = make_event('Charla')
+        self.client.force_login(user)
+        self.client.post(reverse('join_event', args=[event.pk]))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [user.email])
+
+
+@override_settings(EVENTS_LIVE_POLL_INTERVAL=0.2)
+class LiveSeatsTests(TransactionTestCase):
+    def setUp(self):
+        self.event = make_event('En vivo', capacity=3)
+        self.users = make_users(2)
+
+    def test_payload(self):
+        self.assertEqual(
+            seats_payload(1, 3, 5), {'event_id': 1, 'capacity': 3, 'attendees': 5, 'remaining': 0}
+        )
+        self.assertIsNone(seats_payload(1, None, 5)['remaining'])
+
+    def test_stream_pushes_changes_to_every_subscriber(self):
+        event_id = self.event.pk
+
+        async def scenario():
+            streams = [seat_hub.stream(event_id) for _ in range(2)]
+            received = []
+            for stream in streams:
+                await stream.__anext__()  # retry:
+                received.append(await stream.__anext__())
+            await sync_to_async(join_event)(event_id, self.users[0].pk)
+            for stream in streams:
+                received.append(await asyncio.wait_for(stream.__anext__(), 2))
+            # Cambio hecho "en otro proceso": lo detecta el sondeo
+            await sync_to_async(self.event.attendees.add)(self.users[1])
+            received.append(await asyncio.wait_for(streams[0].__anext__(), 2))
+            for stream in streams:
+                await stream.aclose()
+            return [json.loads(message.split('data: ')[1])['attendees'] for message in received]
+
+        self.assertEqual(asyncio.run(scenario()), [0, 0, 1, 1, 2])
+        self.assertEqual(seat_hub._subscribers, {})
+
+    def test_wsgi_does_not_open_the_stream(self):
+        response = self.client.get(reverse('event_detail', args=[self.event.pk]))
+        self.assertNotContains(response, 'new EventSource')
+        response = self.client.get(reverse('event_seats_stream', args=[self.event.pk]))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_asgi_opens_the_stream(self):
+        response = await self.async_client.get(reverse('event_detail', args=[self.event.pk]))
+        self.assertContains(response, 'new EventSource')
+        response = await self.async_client.get(reverse('event_seats_stream', args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        self.events = [
+            make_event(f'Evento {i}', event_date=datetime.date(2030, 1, 1 + i % 3), capacity=5,
+                       image_base64='data:image/png;base64,AAAA')
+            for i in range(7)
+        ]
+        self.user = make_users(1)[0]
+
+    def test_list_pages_with_cursor(self):
+        response = self.client.get('/events/api/events/?limit=3')
+        page = response.json()
+        self.assertEqual(len(page['results']), 3)
+        self.assertNotIn('image_base64', page['results'][0])
+
+        seen = [row['id'] for row in page['results']]
+        while page['next_cursor']:
+            page = self.client.get(f"/events/api/events/?limit=3&cursor={page['next_cursor']}").json()
+            seen += [row['id'] for row in page['results']]
+        expected = sorted(self.events, key=lambda event: (event.event_date, event.pk))
+        self.assertEqual(seen, [event.pk for event in expected])
+
+    def test_etag_returns_304(self):
+        response = self.client.get('/events/api/events/')
+        again = self.client.get('/events/api/events/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_detail_fields(self):
+        self.events[0].attendees.add(self.user)
+        url = f'/events/api/events/{self.events[0].pk}/?fields=event_name,image_base64,remaining_slots'
+        self.assertEqual(self.client.get(url).json(), {
+            'event_name': 'Evento 0', 'image_base64': 'data:image/png;base64,AAAA', 'remaining_slots': 4,
+        })
+        self.assertEqual(self.client.get('/events/api/events/999/').status_code, 404)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get('/events/api/events/?fields=nope').status_code, 400)
+        self.assertEqual(self.client.get('/events/api/events/?cursor=xx').status_code, 400)
+        self.assertEqual(self.client.get('/events/api/events/?limit=a').status_code, 400)
+
+    def test_join_leave_and_my_attendances(self):
+        self.assertEqual(self.client.get('/events/api/me/attendances/').status_code, 401)
+        self.client.force_login(self.user)
+        event = self.events[1]
+        event.attendees.add(make_users(1, prefix='otro')[0])
+
+        response = self.client.post(f'/events/api/events/{event.pk}/join/')
+        self.assertEqual(response.json(), {'event_id': event.pk, 'attending': True})
+        mine = self.client.get('/events/api/me/attendances/?fields=id,attendees_count').json()
+        self.assertEqual(mine['results'], [{'id': event.pk, 'attendees_count': 2}])
+
+        self.client.post(f'/events/api/events/{event.pk}/leave/')
+        self.assertEqual(self.client.get('/events/api/me/attendances/').json()['results'], [])
+
+    def test_join_full_event_conflicts(self):
+        event = make_event('Lleno', capacity=1)
+        event.attendees.add(make_users(1, prefix='otro')[0])
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post(f'/events/api/events/{event.pk}/join/').status_code, 409)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com')
+        self.old = [make_event(f'Pasado {i}', event_date=datetime.date(2020, 1, 1 + i)) for i in range(5)]
+        self.upcoming = make_event('Futuro', event_date=datetime.date(2099, 1, 1))
+        for event in self.old + [self.upcoming]:
+            event.attendees.add(self.user)
+
+    def test_archive_moves_old_events_in_batches(self):
+        build_similar_events()
+        out = io.StringIO()
+        call_command('archive_events', before='2021-01-01', batch_size=2, stdout=out)
+
+        self.assertEqual(out.getvalue().count('Lote archivado'), 3)
+        self.assertEqual(list(Event.objects.values_list('pk', flat=True)), [self.upcoming.pk])
+        self.assertEqual(
+            sorted(ArchivedEvent.objects.values_list('pk', flat=True)), [event.pk for event in self.old]
+        )
+        self.assertEqual(self.user.archived_events_attended.count(), 5)
+        # Recomendaba eventos archivados: debe recalcularse
+        self.assertTrue(Event.objects.get().similar_stale)
+
+    def test_archive_keeps_every_attendance_column(self):
+        event = self.old[0]
+        other = make_users(1)[0]
+        Attendance.objects.filter(event=event, user=self.user).update(price_paid=1500)
+        event.attendees.add(other, through_defaults={'status': Attendance.CANCELLED})
+        original = {
+            row['user_id']: row
+            for row in Attendance.objects.filter(event=event).values('user_id', 'joined_at', 'status', 'price_paid', 'event_date')
+        }
+
+        self.assertEqual(archive_batch(datetime.date(2021, 1, 1)), (5, 6))
+        archived = {
+            row['user_id']: row
+            for row in ArchivedAttendance.objects.filter(event=event.pk).values('user_id', 'joined_at', 'status', 'price_paid', 'event_date')
+        }
+        self.assertEqual(archived, original)
+        # El historial y el conteo del admin sólo consideran las confirmadas
+        self.client.force_login(other)
+        self.assertNotContains(self.client.get(reverse('profile')), 'Pasado 0')
+        self.client.force_login(self.user)
+        changelist = self.client.get(reverse('admin:events_archivedevent_changelist'))
+        self.assertEqual(changelist.context['cl'].queryset.get(pk=event.pk).attendees_total, 1)
+
+    def test_archive_cost_does_not_grow_with_attendance(self):
+        for event in self.old[:2]:
+            for user in make_users(50, prefix=f'e{event.pk}-'):
+                join_event(event.pk, user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(archive_batch(datetime.date(2021, 1, 1)), (5, 105))
+        self.assertLess(len(queries), 20)
+        self.assertFalse(Attendance.objects.filter(event__in=self.old).exists())
+
+    def test_archive_keeps_the_door_log(self):
+        event = self.old[0]
+        checked_in_at = timezone.now()
+        CheckInLog.objects.create(
+            event=event, user=self.user, attendance=event.attendances.get(), checked_in_at=checked_in_at
+        )
+
+        archive_batch(datetime.date(2021, 1, 1))
+        self.assertFalse(CheckInLog.objects.exists())
+        self.assertEqual(
+            list(ArchivedCheckIn.objects.values_list('event', 'user', 'checked_in_at')),
+            [(event.pk, self.user.pk, checked_in_at)],
+        )
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('admin:events_archivedcheckin_changelist')).status_code, 200)
+
+    def test_dry_run_changes_nothing(self):
+        out = io.StringIO()
+        call_command('archive_events', before='2021-01-01', dry_run=True, stdout=out)
+        self.assertIn('Se archivarían 5 eventos', out.getvalue())
+        self.assertEqual(Event.objects.count(), 6)
+
+    def test_bad_date(self):
+        with self.assertRaises(CommandError):
+            call_command('archive_events', before='01-01-2021')
+
+    def test_history_pages(self):
+        archive_batch(datetime.date(2021, 1, 1))
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('profile')), 'Pasado 0')
+        self.assertEqual(self.client.get(reverse('admin:events_archivedevent_changelist')).status_code, 200)
+        change_url = reverse('admin:events_archivedevent_change', args=[self.old[0].pk])
+        self.assertEqual(self.client.get(change_url).status_code, 200)
+
+
+class AttendanceTests(TestCase):
+    def setUp(self):
+        admission._gates.clear()
+        self.event = make_event('Con cupos', capacity=2, event_date=datetime.date(2030, 3, 1))
+        self.user = make_users(1)[0]
+
+    def test_leaving_cancels_and_joining_again_reactivates(self):
+        join_event(self.event.pk, self.user.pk)
+        leave_event(self.event.pk, self.user.pk)
+        self.assertEqual(Attendance.objects.get().status, Attendance.CANCELLED)
+        self.assertFalse(user_events(self.user))
+
+        join_event(self.event.pk, self.user.pk)
+        attendance = Attendance.objects.get()
+        self.assertEqual(attendance.status, Attendance.CONFIRMED)
+        self.assertEqual(attendance.event_date, self.event.event_date)
+        self.assertEqual([event.pk for event in user_events(self.user)], [self.event.pk])
+
+    def test_event_date_follows_the_event(self):
+        join_event(self.event.pk, self.user.pk)
+        self.event.event_date = datetime.date(2030, 4, 1)
+        self.event.save()
+        self.assertEqual(Attendance.objects.get().event_date, datetime.date(2030, 4, 1))
+
+    def test_event_date_is_copied_on_add(self):
+        self.event.attendees.add(self.user)
+        other = make_event('Otro', event_date=datetime.date(2030, 5, 1))
+        self.user.events_attending.add(other)
+        self.assertEqual(
+            dict(Attendance.objects.values_list('event', 'event_date')),
+            {self.event.pk: self.event.event_date, other.pk: other.event_date},
+        )
+
+    def test_pages(self):
+        join_event(self.event.pk, self.user.pk)
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('event_detail', args=[self.event.pk])), 'Ya estás inscrito')
+        self.assertContains(self.client.get(reverse('profile')), 'Con cupos')
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com'))
+        self.assertEqual(self.client.get(reverse('admin:events_event_changelist')).status_code, 200)
+        change_url = reverse('admin:events_event_change', args=[self.event.pk])
+        self.assertContains(self.client.get(change_url), self.user.username)
+
+
+class AdmissionGateTests(SimpleTestCase):
+    # Ritmo alto: las fichas se reponen al instante y sólo limita la concurrencia
+    RATE = 10 ** 9
+
+    def test_admits_until_concurrency_then_queues_in_order(self):
+        gate = AdmissionGate(concurrency=1, rate=self.RATE, max_waiting=10)
+        self.assertTrue(gate.enter().admitted)
+        first, second = gate.enter(), gate.enter()
+        self.assertEqual((first.ticket, first.position), (1, 1))
+        self.assertEqual((second.ticket, second.position), (2, 2))
+
+        gate.leave()
+        # El cupo liberado queda reservado para el primer número, no para quien llega
+        self.assertFalse(gate.enter().admitted)
+        self.assertFalse(gate.enter(second.ticket).admitted)
+        self.assertTrue(gate.enter(first.ticket).admitted)
+
+    def test_rejects_when_queue_is_full(self):
+        gate = AdmissionGate(concurrency=0, rate=self.RATE, max_waiting=1)
+        self.assertFalse(gate.enter().rejected)
+        self.assertTrue(gate.enter().rejected)
+
+    def test_unclaimed_slot_expires(self):
+        gate = AdmissionGate(concurrency=1, rate=self.RATE, max_waiting=10, claim_timeout=0)
+        self.assertTrue(gate.enter().admitted)
+        absent = gate.enter()
+        present = gate.enter()
+        gate.leave()
+        gate.stats()  # llama al primero; con claim_timeout=0 su reserva vence enseguida
+        time.sleep(0.01)
+        self.assertTrue(gate.enter(present.ticket).admitted)
+        self.assertFalse(gate.enter(absent.ticket).admitted)
+
+
+@override_settings(EVENTS_ADMISSION_CONCURRENCY=0)
+class WaitingRoomTests(TestCase):
+    def setUp(self):
+        admission._gates.clear()
+        self.event = make_event('Concurrido', capacity=3)
+        self.client.force_login(make_users(1)[0])
+
+    def test_full_gate_shows_waiting_room(self):
+        response = self.client.post(reverse('join_event', args=[self.event.pk]))
+        self.assertContains(response, 'Tu lugar en la fila')
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client.session[f'admission_ticket_{self.event.pk}'], 1)
+
+    def test_retries_keep_the_ticket_without_writing_the_session(self):
+        url = reverse('join_event', args=[self.event.pk])
+        self.client.post(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url)
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE "django_session"')])
+        self.assertEqual(self.client.session[f'admission_ticket_{self.event.pk}'], 1)
+
+    def test_unknown_event_creates_no_gate(self):
+        response = self.client.post(reverse('join_event', args=[self.event.pk + 1000]))
+        self.assertRedirects(response, reverse('event_detail', args=[self.event.pk + 1000]), fetch_redirect_response=False)
+        self.assertEqual(self.client.post(f'/events/api/events/{self.event.pk + 1000}/join/').status_code, 404)
+        self.assertNotIn(self.event.pk + 1000, admission._gates)
+
+    @override_settings(EVENTS_ADMISSION_IDLE_TIMEOUT=0, EVENTS_ADMISSION_CONCURRENCY=1)
+    def test_idle_gates_are_dropped(self):
+        self.client.post(reverse('join_event', args=[self.event.pk]))
+        other = make_event('Otro')
+        self.client.post(reverse('join_event', args=[other.pk]))
+        self.assertEqual(list(admission._gates), [other.pk])
+
+    def test_api_answers_429(self):
+        response = self.client.post(f'/events/api/events/{self.event.pk}/join/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json(), {'queued': True, 'position': 1})
+        self.assertIn('Retry-After', response)
+
+
+class WaitlistTests(TestCase):
+    def setUp(self):
+        admission._gates.clear()
+        self.event = make_event('Con lista de espera', capacity=1)
+        self.users = make_users(4)
+        join_event(self.event.pk, self.users[0].pk)
+        for user in self.users[1:]:
+            self.client.force_login(user)
+            response = self.client.post(reverse('join_waitlist', args=[self.event.pk]), follow=True)
+        self.assertContains(response, 'lugar 3')
+
+    def test_positions(self):
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.waitlist_count, 3)
+        self.assertContains(self.client.get(reverse('event_detail', args=[self.event.pk])), 'En lista de espera: lugar 3')
+        self.assertContains(self.client.get(reverse('profile')), 'Lugar 3 de 3')
+
+    def test_leaving_promotes_the_first_in_line(self):
+        self.client.force_login(self.users[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('leave_event', args=[self.event.pk]))
+        self.assertEqual(list(self.event.attendances.confirmed().values_list('user', flat=True)), [self.users[1].pk])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.waitlist_count, 2)
+
+    def test_capacity_increase_promotes(self):
+        Event.objects.filter(pk=self.event.pk).update(capacity=3)
+        promote_waitlist(self.event.pk)
+        self.assertEqual(self.event.attendances.confirmed().count(), 3)
+        self.assertEqual(list(WaitlistEntry.objects.values_list('user', flat=True)), [self.users[3].pk])
+
+    def test_promotion_skips_users_already_confirmed(self):
+        # El admin sube la capacidad e inscribe a mano al primero de la fila
+        Event.objects.filter(pk=self.event.pk).update(capacity=3)
+        Attendance.objects.create(event=self.event, user=self.users[1])
+        promote_waitlist(self.event.pk)
+        self.assertEqual(
+            set(self.event.attendances.confirmed().values_list('user', flat=True)),
+            {user.pk for user in self.users[:3]},
+        )
+        self.assertEqual(list(WaitlistEntry.objects.values_list('user', flat=True)), [self.users[3].pk])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.waitlist_count, 1)
+
+    def test_reconcile_fixes_drifted_counts(self):
+        Event.objects.update(waitlist_count=9)
+        reconcile_waitlist_counts()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.waitlist_count, 3)
+
+
+@override_settings(EVENTS_CHECKIN_FLUSH_INTERVAL=0, EVENTS_CHECKIN_FLUSH_SIZE=2)
+class CheckInTests(TestCase):
+    def setUp(self):
+        admission._gates.clear()
+        checkin._desks.clear()
+        self.event = make_event('Con puerta', capacity=5)
+        self.users = make_users(3)
+        for user in self.users:
+            join_event(self.event.pk, user.pk)
+        leave_event(self.event.pk, self.users[2].pk)
+        self.url = f'/events/api/events/{self.event.pk}/checkin/'
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+
+    def ticket(self, user, event=None):
+        event = event or self.event
+        return make_ticket(event.pk, user.pk, user.attendances.get(event=self.event).pk)
+
+    def scan(self, token):
+        return self.client.post(self.url, {'token': token})
+
+    def test_profile_shows_ticket(self):
+        self.client.force_login(self.users[0])
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.context['user_events'][0].ticket, self.ticket(self.users[0]))
+
+    def test_only_staff(self):
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.scan(self.ticket(self.users[0])).status_code, 403)
+
+    def test_scan(self):
+        token = self.ticket(self.users[0])
+        self.assertEqual(self.scan(token).json()['status'], 'ok')
+        self.assertEqual(self.scan(token).status_code, 409)
+        self.assertEqual(self.scan(token + 'x').json()['status'], 'invalid')
+        self.assertEqual(self.scan(self.ticket(self.users[0], make_event('Otro'))).json()['status'], 'wrong_event')
+        self.assertEqual(self.scan(self.ticket(self.users[2])).json()['status'], 'cancelled')
+        self.assertEqual(self.scan(self.ticket(self.users[1])).status_code, 200)
+        self.assertEqual(self.scan('').status_code, 400)
+        self.assertEqual(
+            set(CheckInLog.objects.values_list('user', flat=True)), {self.users[0].pk, self.users[1].pk}
+        )
+
+    def test_deleted_attendance_is_rejected(self):
+        token = self.ticket(self.users[0])
+        Attendance.objects.filter(user=self.users[0]).delete()
+        response = self.scan(token)
+        self.assertEqual((response.status_code, response.json()['status']), (422, 'unknown'))
+
+    def test_attendance_created_after_loading_is_accepted(self):
+        self.scan(self.ticket(self.users[0]))
+        late = make_users(1, prefix='late')[0]
+        join_event(self.event.pk, late.pk)
+        self.assertEqual(self.scan(self.ticket(late)).json()['status'], 'ok')
+
+    def test_flush_without_new_rows_does_not_reload(self):
+        desk = checkin.CheckInDesk(self.event.pk, flush_interval=3600, refresh_interval=3600)
+        desk.scan(self.ticket(self.users[0]))
+        self.assertEqual(desk.flush(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(desk.flush(), 0)
+
+    @override_settings(EVENTS_CHECKIN_IDLE_TIMEOUT=0)
+    def test_idle_desks_are_dropped(self):
+        desk = checkin.desk_for(self.event.pk)
+        desk.scan(self.ticket(self.users[0]))
+        self.assertEqual(checkin.drop_idle_desks(), 1)
+        self.assertNotIn(self.event.pk, checkin._desks)
+        # Quien aún tenía la puerta descartada escribe en cada lectura
+        desk.flush_interval = 3600
+        desk.scan(self.ticket(self.users[1]))
+        self.assertTrue(CheckInLog.objects.filter(user=self.users[1]).exists())
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('check_in', str(self.event.pk), self.ticket(self.users[1]), 'zz', stdout=out)
+        self.assertIn('Aceptadas: 1 | Rechazadas: 1', out.getvalue())
+        self.assertTrue(CheckInLog.objects.filter(user=self.users[1]).exists())
+
+
+class CheckInFlushTests(TransactionTestCase):
+    # Las FK de SQLite se verifican al confirmar: hace falta una transacción real
+    def setUp(self):
+        admission._gates.clear()
+        self.event = make_event('Con puerta')
+        self.users = make_users(2)
+        for user in self.users:
+            join_event(self.event.pk, user.pk)
+        self.desk = checkin.CheckInDesk(self.event.pk, flush_size=100, flush_interval=3600)
+
+    def test_rows_that_no_longer_fit_are_dropped(self):
+        for user in self.users:
+            attendance = user.attendances.get()
+            self.assertTrue(self.desk.scan(make_ticket(self.event.pk, user.pk, attendance.pk)).accepted)
+        # Se borra entre la lectura y la escritura
+        Attendance.objects.filter(user=self.users[1]).delete()
+
+        with self.assertLogs('events.checkin', 'WARNING'):
+            self.assertEqual(self.desk.flush(), 2)
+        self.assertEqual(list(CheckInLog.objects.values_list('user', flat=True)), [self.users[0].pk])
+        self.assertEqual(self.desk.stats()['pending'], 0)
+
+
+class CalendarTests(TestCase):
+    def setUp(self):
+        admission._gates.clear()
+        self.event = make_event('Fiesta, con; comas\ny salto ' + 'x' * 100, capacity=5)
+        self.user = make_users(1)[0]
+        join_event(self.event.pk, self.user.pk)
+        self.url = reverse('calendar_user', args=[feed_token(self.user.pk)])
+
+    def test_user_feed(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('profile')), self.url)
+        self.client.logout()
+
+        response = self.client.get(self.url)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('SUMMARY:Fiesta\\, con\\; comas\\ny salto', body)
+        # RFC 5545: líneas de hasta 75 octetos
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+        # Sólo lee las versiones, sin recorrer eventos
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            leave_event(self.event.pk, self.user.pk)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('BEGIN:VEVENT', b''.join(response.streaming_content).decode())
+
+    def test_event_change_invalidates_upcoming(self):
+        url = reverse('calendar_upcoming')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.location = 'Sala 2'
+            self.event.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_last_modified_always_advances(self):
+        # Varios cambios en el mismo segundo, en claves distintas
+        seen = [feed_validators(self.user.pk)[1]]
+        for touch in [touch_events, lambda: touch_users([self.user.pk])] * 3:
+            touch()
+            seen.append(feed_validators(self.user.pk)[1])
+        self.assertEqual(seen, sorted(set(seen)))
+
+    def test_touch_costs_one_query(self):
+        touch_users([self.user.pk])
+        with self.assertNumQueries(1):
+            touch_users([self.user.pk])
+
+    def test_bad_token(self):
+        self.assertEqual(self.client.get(reverse('calendar_user', args=['5:bad'])).status_code, 404)
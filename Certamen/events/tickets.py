@@ -0,0 +1,58 @@
+# apps/events/tickets.py
+"""
+Entradas firmadas para el control de acceso.
+
+Cada asistencia confirmada tiene un código corto con la forma
+`<evento>.<usuario>.<asistencia>.<firma>`: los ids van en base 62 y la firma
+es un HMAC-SHA256 truncado a 96 bits, calculado con `SECRET_KEY`. La puerta
+lo verifica sin leer la base de datos; también se aceptan las claves de
+`SECRET_KEY_FALLBACKS` para poder rotar la clave sin invalidar entradas ya
+entregadas.
+
+La firma no caduca: una asistencia cancelada o borrada después de emitir la
+entrada se rechaza en `events.checkin`, que conoce las asistencias del evento.
+"""
+import base64
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.signing import b62_decode, b62_encode
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+TICKET_SALT = 'events.tickets'
+SIGNATURE_BYTES = 12
+
+
+@dataclass(frozen=True)
+class Ticket:
+    event_id: int
+    user_id: int
+    attendance_id: int
+
+
+def _signature(payload, secret=None):
+    digest = salted_hmac(TICKET_SALT, payload, secret=secret, algorithm='sha256').digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).decode()
+
+
+def make_ticket(event_id, user_id, attendance_id):
+    """Código firmado de una asistencia"""
+    payload = '.'.join(b62_encode(value) for value in (event_id, user_id, attendance_id))
+    return f'{payload}.{_signature(payload)}'
+
+
+def read_ticket(token):
+    """Retorna el `Ticket` si la firma es válida, o None; no consulta la base de datos"""
+    payload, _, signature = token.strip().rpartition('.')
+    if not payload:
+        return None
+    secrets = [settings.SECRET_KEY, *settings.SECRET_KEY_FALLBACKS]
+    if not any(constant_time_compare(signature, _signature(payload, secret)) for secret in secrets):
+        return None
+    parts = payload.split('.')
+    if len(parts) != 3:
+        return None
+    try:
+        return Ticket(*(b62_decode(part) for part in parts))
+    except ValueError:
+        return None
@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import include, path
 
 from . import views
 
@@ -8,4 +8,10 @@ urlpatterns = [
     path("<int:event_id>/", views.event_detail, name="event_detail"),
     path("<int:event_id>/join/", views.join_event_view, name="join_event"),
     path("<int:event_id>/leave/", views.leave_event_view, name="leave_event"),
+    path("<int:event_id>/waitlist/join/", views.join_waitlist_view, name="join_waitlist"),
+    path("<int:event_id>/waitlist/leave/", views.leave_waitlist_view, name="leave_waitlist"),
+    path("<int:event_id>/seats/stream/", views.event_seats_stream, name="event_seats_stream"),
+    path("calendar/upcoming.ics", views.calendar_upcoming, name="calendar_upcoming"),
+    path("calendar/<str:token>/events.ics", views.calendar_user, name="calendar_user"),
+    path("api/", include("events.api.urls")),
 ]
\ No newline at end of file
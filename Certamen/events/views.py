@@ -1,8 +1,20 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from .models import Event
-from .services import join_event
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+from .models import Event, confirmed_attendees_count
+from .admission import release_admission, request_admission
+from .ical import feed_validators, render_feed, upcoming_rows, user_id_from_token, user_rows
+from .live import seat_hub
+from .services import is_attending, join_event, join_waitlist, leave_event, leave_waitlist, waitlist_position
+from .recommendations import similar_events_for
+from .tasks import send_join_confirmation
 from django.core.exceptions import ValidationError
 
 
@@ -14,22 +26,44 @@ def home(request):
 
 def index(request):
     """Vista principal que muestra todos los eventos"""
-    events = Event.objects.all().order_by('event_date')
+    events = Event.objects.annotate(confirmed_count=confirmed_attendees_count()).order_by('event_date')
     return render(request, 'events/events.html', {'events': events})
 
 
+def _live_seats_enabled(request):
+    # Bajo WSGI (runserver, gunicorn) un stream infinito ocupa un hilo para siempre
+    # y nunca entrega datos: sólo se ofrece cuando la petición llega por ASGI
+    return isinstance(request, ASGIRequest) and getattr(settings, 'EVENTS_LIVE_SEATS', True)
+
+
 def event_detail(request, event_id):
     """Vista de detalle de un evento específico"""
-    event = get_object_or_404(Event, pk=event_id)
-    return render(request, 'events/event_detail.html', {'event': event})
+    event = get_object_or_404(Event.objects.annotate(confirmed_count=confirmed_attendees_count()), pk=event_id)
+    context = {
+        'event': event,
+        'similar_events': similar_events_for(event.pk),
+        'is_attending': request.user.is_authenticated and is_attending(event.pk, request.user.id),
+        'live_seats': _live_seats_enabled(request),
+        'waitlist_position': (
+            waitlist_position(event.pk, request.user.id)
+            if request.user.is_authenticated and event.waitlist_count else None
+        ),
+    }
+    return render(request, 'events/event_detail.html', context)
 
 
 @login_required
 def join_event_view(request, event_id):
     """Vista para inscribirse a un evento"""
     if request.method == 'POST':
+        # Sala de espera: si hay demasiadas inscripciones en curso, se entrega un número
+        admission = request_admission(request, event_id)
+        if not admission.admitted:
+            return waiting_room(request, event_id, admission)
+        
         try:
             event = join_event(event_id, request.user.id)
+            send_join_confirmation.delay(event_id=event.pk, user_id=request.user.id)
             messages.success(
                 request, 
                 f'¡Te has inscrito exitosamente en "{event.event_name}"! '
@@ -41,6 +75,8 @@ def join_event_view(request, event_id):
             messages.error(request, str(e.message))
         except Exception as e:
             messages.error(request, f'Ocurrió un error: {str(e)}')
+        finally:
+            release_admission(event_id)
         
         return redirect('event_detail', event_id=event_id)
     
@@ -48,15 +84,67 @@ def join_event_view(request, event_id):
     return redirect('event_detail', event_id=event_id)
 
 
+@login_required
+def join_waitlist_view(request, event_id):
+    """Vista para anotarse en la lista de espera de un evento completo"""
+    if request.method == 'POST':
+        try:
+            join_waitlist(event_id, request.user.id)
+            position = waitlist_position(event_id, request.user.id)
+            messages.success(
+                request,
+                f'Te anotamos en la lista de espera (lugar {position}). '
+                f'Si se libera una plaza te inscribiremos automáticamente.'
+            )
+        except Event.DoesNotExist:
+            messages.error(request, 'El evento no existe.')
+        except ValidationError as e:
+            messages.error(request, str(e.message))
+        except Exception as e:
+            messages.error(request, f'Ocurrió un error: {str(e)}')
+    
+    return redirect('event_detail', event_id=event_id)
+
+
+@login_required
+def leave_waitlist_view(request, event_id):
+    """Vista para salir de la lista de espera"""
+    if request.method == 'POST':
+        try:
+            if leave_waitlist(event_id, request.user.id):
+                messages.success(request, 'Saliste de la lista de espera.')
+            else:
+                messages.info(request, 'No estabas en la lista de espera.')
+        except Event.DoesNotExist:
+            messages.error(request, 'El evento no existe.')
+        except Exception as e:
+            messages.error(request, f'Ocurrió un error: {str(e)}')
+    
+    return redirect('event_detail', event_id=event_id)
+
+
+def waiting_room(request, event_id, admission):
+    """Página "estás en la fila" que reintenta la inscripción automáticamente"""
+    event = get_object_or_404(Event.objects.only('event_name', 'event_date'), pk=event_id)
+    context = {
+        'event': event,
+        'admission': admission,
+        'retry_seconds': int(admission.retry_after + 0.5),
+    }
+    response = render(request, 'events/waiting_room.html', context)
+    response['Retry-After'] = context['retry_seconds']
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
 @login_required
 def leave_event_view(request, event_id):
     """Vista para desinscribirse de un evento"""
     if request.method == 'POST':
         try:
-            event = get_object_or_404(Event, pk=event_id)
+            event, was_attending = leave_event(event_id, request.user.id)
             
-            if request.user in event.attendees.all():
-                event.attendees.remove(request.user)
+            if was_attending:
                 messages.success(
                     request,
                     f'Te has desinscrito de "{event.event_name}".'
@@ -72,4 +160,50 @@ def leave_event_view(request, event_id):
         return redirect('event_detail', event_id=event_id)
     
     # Si no es POST, redirigir al detalle
-    return redirect('event_detail', event_id=event_id)
\ No newline at end of file
+    return redirect('event_detail', event_id=event_id)
+
+
+async def event_seats_stream(request, event_id):
+    """Stream SSE con las plazas restantes del evento (requiere servidor ASGI)"""
+    if not _live_seats_enabled(request):
+        # 204 hace que EventSource deje de reconectar
+        return HttpResponse(status=204)
+    if not await Event.objects.filter(pk=event_id).aexists():
+        raise Http404('El evento no existe.')
+    response = StreamingHttpResponse(seat_hub.stream(event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # evita el buffering de proxies como nginx
+    return response
+
+
+def _calendar_response(request, rows, name, user_id=None):
+    """Feed .ics en stream; 304 si la app ya tiene la versión actual"""
+    etag, last_modified = feed_validators(user_id)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = StreamingHttpResponse(
+            render_feed(rows(), name, request.build_absolute_uri('/').rstrip('/'), request.get_host()),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'inline; filename="eventos.ics"'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True, **({'private': True} if user_id else {'public': True}))
+    return response
+
+
+@gzip_page
+@require_GET
+def calendar_upcoming(request):
+    """Feed iCalendar público con los próximos eventos"""
+    return _calendar_response(request, upcoming_rows, 'Smart Events - Próximos eventos')
+
+
+@gzip_page
+@require_GET
+def calendar_user(request, token):
+    """Feed iCalendar de los eventos del usuario (URL firmada, sin sesión)"""
+    user_id = user_id_from_token(token)
+    if user_id is None:
+        raise Http404('El calendario no existe.')
+    return _calendar_response(request, lambda: user_rows(user_id), 'Smart Events - Mis eventos', user_id)
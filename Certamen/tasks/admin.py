@@ -0,0 +1,26 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """Vista de la cola de tareas (sólo lectura, salvo para reintentar)"""
+
+    list_display = ['id', 'name', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name']
+    readonly_fields = [field.name for field in Task._meta.fields]
+    ordering = ['-created_at']
+    actions = ['retry_tasks']
+
+    @admin.action(description='Reintentar tareas seleccionadas')
+    def retry_tasks(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.exclude(status=Task.RUNNING).update(
+            status=Task.PENDING, attempts=0, run_after=timezone.now()
+        )
+        self.message_user(request, f"{updated} tareas reencoladas.")
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,103 @@
+import multiprocessing
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tasks.queue import enqueue_unless_pending, queue_stats, requeue_stale
+from tasks.worker import process_main, work
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta las tareas encoladas con un pool de hilos o de procesos. Los procesos "
+        "sirven para tareas que usan CPU (p. ej. miniaturas con Pillow), que en hilos se "
+        "turnan el GIL; los hilos bastan para tareas que esperan E/S (correo)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Cantidad de hilos o procesos")
+        parser.add_argument('--pool', choices=['threads', 'processes'], default='threads')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Segundos de espera cuando la cola está vacía")
+        parser.add_argument('--metrics-interval', type=float, default=60.0,
+                            help="Cada cuántos segundos reportar métricas (0 para desactivar)")
+        parser.add_argument('--once', action='store_true',
+                            help="Vacía la cola y termina en lugar de quedar escuchando")
+        parser.add_argument('--stats', action='store_true',
+                            help="Sólo muestra las métricas de la cola y termina")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.report()
+            return
+
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f"Tareas reencoladas tras un corte: {requeued}")
+
+        if options['pool'] == 'processes':
+            context = multiprocessing.get_context()
+            # Con "fork" los hijos heredarían las conexiones abiertas del padre
+            connections.close_all()
+            self.stop = context.Event()
+            workers = [
+                context.Process(
+                    target=process_main,
+                    args=(self.stop, options['poll_interval'], options['once'], f"task-process-{i}"),
+                    name=f"task-process-{i}",
+                    daemon=True,
+                )
+                for i in range(options['workers'])
+            ]
+        else:
+            self.stop = threading.Event()
+            workers = [
+                threading.Thread(
+                    target=work,
+                    args=(self.stop, options['poll_interval'], options['once'], f"task-worker-{i}"),
+                    kwargs={'write': self.stdout.write},
+                    name=f"task-worker-{i}",
+                    daemon=True,
+                )
+                for i in range(options['workers'])
+            ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(self.style.SUCCESS(f"{len(workers)} workers escuchando la cola"))
+
+        interval = options['metrics_interval']
+        # Con --once sólo se vacía la cola: no se encolan tareas periódicas
+        periodic = {} if options['once'] else getattr(settings, 'TASKS_PERIODIC', {})
+        next_run = dict.fromkeys(periodic, time.monotonic())  # se encolan al arrancar
+        next_report = time.monotonic() + interval
+        try:
+            while any(worker.is_alive() for worker in workers):
+                now = time.monotonic()
+                for name, every in periodic.items():
+                    if now >= next_run[name]:
+                        enqueue_unless_pending(name)
+                        next_run[name] = now + every
+                if interval and now >= next_report:
+                    self.report()
+                    next_report = now + interval
+                for worker in workers:
+                    if worker.is_alive():
+                        worker.join(timeout=1.0)
+                        break
+        except KeyboardInterrupt:
+            self.stdout.write("Deteniendo workers...")
+            self.stop.set()
+            for worker in workers:
+                worker.join()
+
+    def report(self):
+        stats = queue_stats()
+        depth = ", ".join(f"{status}={n}" for status, n in stats['depth'].items())
+        self.stdout.write(
+            f"Cola: {depth} | pendiente más antigua: {stats['oldest_pending_age']:.1f}s | "
+            f"última hora: {stats['done_last_window']} completadas, "
+            f"espera media {stats['avg_wait']:.3f}s, ejecución media {stats['avg_runtime']:.3f}s"
+        )
@@ -0,0 +1,158 @@
+"""
+Cola de tareas local respaldada por la base de datos.
+
+Uso:
+
+    from tasks.queue import task
+
+    @task('events.generate_thumbnail')
+    def generate_thumbnail(event_id):
+        ...
+
+    generate_thumbnail.delay(event_id=event.pk)
+
+`delay()` sólo inserta una fila en `Task` (dentro de la transacción de la
+petición) y retorna; `manage.py run_workers` la ejecuta después. Con
+`TASKS_ALWAYS_EAGER = True` la tarea se ejecuta en línea, útil en tests.
+Las tareas de `TASKS_PERIODIC` las encola `run_workers` cada cierto tiempo.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Avg, Count, F, Min
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name, max_attempts=5):
+    """Registra una función como tarea y le agrega el método `delay()`"""
+    def decorator(func):
+        if name in _registry:
+            raise ValueError(f"La tarea '{name}' ya está registrada.")
+        _registry[name] = func
+        func.task_name = name
+        func.delay = lambda **payload: enqueue(name, max_attempts=max_attempts, **payload)
+        return func
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"La tarea '{name}' no está registrada.") from None
+
+
+def enqueue(name, *, max_attempts=5, countdown=0, **payload):
+    """Encola una tarea; el payload debe ser serializable a JSON"""
+    func = get_task(name)
+    if getattr(settings, 'TASKS_ALWAYS_EAGER', False):
+        func(**payload)
+        return None
+    return Task.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=countdown),
+    )
+
+
+def enqueue_unless_pending(name, **payload):
+    """Encola la tarea salvo que ya haya una igual pendiente o en ejecución (tareas periódicas)"""
+    if Task.objects.filter(name=name, status__in=[Task.PENDING, Task.RUNNING]).exists():
+        return None
+    return enqueue(name, **payload)
+
+
+def retry_delay(attempts):
+    """Backoff exponencial: base, 2*base, 4*base... con tope"""
+    base = getattr(settings, 'TASKS_RETRY_BACKOFF', 5)
+    cap = getattr(settings, 'TASKS_RETRY_BACKOFF_MAX', 3600)
+    return timedelta(seconds=min(cap, base * 2 ** max(0, attempts - 1)))
+
+
+def claim_next():
+    """
+    Toma la siguiente tarea pendiente.
+
+    SQLite no tiene SELECT ... FOR UPDATE SKIP LOCKED, así que la tarea se
+    reclama con un UPDATE condicional: sólo un worker logra cambiar el estado.
+    """
+    while True:
+        candidate = (
+            Task.objects
+            .filter(status=Task.PENDING, run_after__lte=timezone.now())
+            .order_by('run_after', 'id')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+        claimed = Task.objects.filter(pk=candidate, status=Task.PENDING).update(
+            status=Task.RUNNING,
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=candidate)
+
+
+def run_task(task_obj):
+    """Ejecuta una tarea ya reclamada y registra el resultado o el reintento"""
+    try:
+        get_task(task_obj.name)(**task_obj.payload)
+    except Exception:
+        task_obj.last_error = traceback.format_exc()
+        if task_obj.attempts < task_obj.max_attempts:
+            task_obj.status = Task.PENDING
+            task_obj.run_after = timezone.now() + retry_delay(task_obj.attempts)
+            logger.warning("Tarea %s falló (intento %s), se reintentará", task_obj, task_obj.attempts)
+        else:
+            task_obj.status = Task.FAILED
+            task_obj.finished_at = timezone.now()
+            logger.error("Tarea %s falló definitivamente", task_obj)
+    else:
+        task_obj.status = Task.DONE
+        task_obj.finished_at = timezone.now()
+        task_obj.last_error = ''
+    task_obj.save(update_fields=['status', 'run_after', 'finished_at', 'last_error'])
+    return task_obj.status
+
+
+def requeue_stale(older_than=None):
+    """Devuelve a la cola las tareas que quedaron 'en ejecución' por un worker caído"""
+    if older_than is None:
+        older_than = timedelta(seconds=getattr(settings, 'TASKS_STALE_AFTER', 600))
+    return Task.objects.filter(
+        status=Task.RUNNING, started_at__lt=timezone.now() - older_than
+    ).update(status=Task.PENDING, run_after=timezone.now())
+
+
+def queue_stats(window=timedelta(hours=1)):
+    """Métricas de la cola: profundidad por estado y latencias recientes"""
+    now = timezone.now()
+    depth = dict(
+        Task.objects.values_list('status').annotate(n=Count('id')).values_list('status', 'n')
+    )
+    oldest = Task.objects.filter(status=Task.PENDING, run_after__lte=now).aggregate(
+        oldest=Min('run_after')
+    )['oldest']
+    recent = Task.objects.filter(status=Task.DONE, finished_at__gte=now - window).aggregate(
+        wait=Avg(F('started_at') - F('run_after')),
+        runtime=Avg(F('finished_at') - F('started_at')),
+        done=Count('id'),
+    )
+    return {
+        'depth': {status: depth.get(status, 0) for status, _ in Task.STATUS_CHOICES},
+        'oldest_pending_age': (now - oldest).total_seconds() if oldest else 0.0,
+        'done_last_window': recent['done'],
+        'avg_wait': recent['wait'].total_seconds() if recent['wait'] else 0.0,
+        'avg_runtime': recent['runtime'].total_seconds() if recent['runtime'] else 0.0,
+    }
@@ -0,0 +1,130 @@
+import base64
+import io
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from events.tests import make_event
+
+from .models import Task
+from .management.commands.run_workers import Command as RunWorkersCommand
+from .queue import (
+    claim_next, enqueue, enqueue_unless_pending, queue_stats, requeue_stale, retry_delay, run_task, task,
+)
+
+calls = []
+
+
+@task('tests.flaky', max_attempts=2)
+def flaky(value):
+    calls.append(value)
+    if value == 'falla':
+        raise RuntimeError(value)
+
+
+def png_data_uri(size=(500, 300)):
+    buffer = io.BytesIO()
+    Image.new('RGBA', size).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_only_enqueues(self):
+        flaky.delay(value='ok')
+        self.assertEqual(calls, [])
+        self.assertEqual(Task.objects.get().payload, {'value': 'ok'})
+
+    def test_claim_and_run(self):
+        flaky.delay(value='ok')
+        task_obj = claim_next()
+        self.assertEqual(task_obj.status, Task.RUNNING)
+        self.assertIsNone(claim_next())
+        self.assertEqual(run_task(task_obj), Task.DONE)
+        self.assertEqual(calls, ['ok'])
+
+    def test_failure_retries_with_backoff_then_fails(self):
+        flaky.delay(value='falla')
+        task_obj = claim_next()
+        with self.assertLogs('tasks.queue', 'WARNING'):
+            self.assertEqual(run_task(task_obj), Task.PENDING)
+        self.assertIn('RuntimeError', task_obj.last_error)
+        # El reintento queda en el futuro
+        self.assertIsNone(claim_next())
+
+        Task.objects.update(run_after=task_obj.created_at)
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertEqual(run_task(claim_next()), Task.FAILED)
+        self.assertEqual(queue_stats()['depth'][Task.FAILED], 1)
+
+    @override_settings(TASKS_RETRY_BACKOFF=5, TASKS_RETRY_BACKOFF_MAX=30)
+    def test_retry_delay_is_capped(self):
+        self.assertEqual(
+            [retry_delay(n).total_seconds() for n in range(1, 6)], [5, 10, 20, 30, 30]
+        )
+
+    def test_requeue_stale(self):
+        flaky.delay(value='ok')
+        task_obj = claim_next()
+        Task.objects.update(started_at=task_obj.started_at - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Task.objects.get().status, Task.PENDING)
+
+    def test_enqueue_unless_pending(self):
+        self.assertIsNotNone(enqueue_unless_pending('tests.flaky', value='ok'))
+        self.assertIsNone(enqueue_unless_pending('tests.flaky', value='ok'))
+        run_task(claim_next())
+        self.assertIsNotNone(enqueue_unless_pending('tests.flaky', value='ok'))
+
+    def test_unknown_task(self):
+        with self.assertRaises(LookupError):
+            enqueue('tests.no_existe')
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_runs_inline(self):
+        flaky.delay(value='ok')
+        self.assertEqual(calls, ['ok'])
+        self.assertFalse(Task.objects.exists())
+
+
+class RunWorkersTests(TransactionTestCase):
+    def test_thread_pool_generates_thumbnail(self):
+        event = make_event('Con imagen', image_base64=png_data_uri())
+        enqueue('events.generate_thumbnail', event_id=event.pk)
+        call_command('run_workers', workers=2, once=True, metrics_interval=0, stdout=io.StringIO())
+
+        event.refresh_from_db()
+        self.assertTrue(event.thumbnail_base64.startswith('data:image/jpeg;base64,'))
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    @override_settings(TASKS_PERIODIC={'events.reconcile_waitlist_counts': 3600})
+    def test_periodic_tasks_are_enqueued_on_start(self):
+        event = make_event('Con contador desviado', waitlist_count=7)
+        command = RunWorkersCommand(stdout=io.StringIO())
+        runner = threading.Thread(
+            target=call_command, args=(command,), kwargs={'poll_interval': 0.05, 'metrics_interval': 0},
+        )
+        runner.start()
+        try:
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and not Task.objects.filter(status=Task.DONE).exists():
+                time.sleep(0.05)
+        finally:
+            command.stop.set()
+            runner.join()
+
+        task_obj = Task.objects.get()
+        self.assertEqual((task_obj.name, task_obj.status), ('events.reconcile_waitlist_counts', Task.DONE))
+        event.refresh_from_db()
+        self.assertEqual(event.waitlist_count, 0)
+
+    def test_stats(self):
+        out = io.StringIO()
+        call_command('run_workers', stats=True, stdout=out)
+        self.assertIn('pending=0', out.getvalue())
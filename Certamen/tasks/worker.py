@@ -0,0 +1,44 @@
+"""
+Bucle de un worker de la cola, compartido por el pool de hilos y el de procesos
+de `manage.py run_workers`.
+
+Este módulo no importa modelos al cargarse: un proceso creado con "spawn"
+(Windows, macOS) lo importa antes de tener Django configurado.
+"""
+import time
+
+
+def work(stop, poll_interval, once, name, write=print):
+    """Toma tareas hasta que `stop` se activa (o la cola se vacía, con `once`)"""
+    from django.db import close_old_connections, connection
+
+    from tasks.queue import claim_next, run_task
+
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            task_obj = claim_next()
+            if task_obj is None:
+                if once:
+                    return
+                stop.wait(poll_interval)
+                continue
+            started = time.monotonic()
+            status = run_task(task_obj)
+            write(
+                f"[{name}] {task_obj.name} #{task_obj.pk}: "
+                f"{status} en {time.monotonic() - started:.3f}s"
+            )
+    finally:
+        connection.close()
+
+
+def process_main(stop, poll_interval, once, name):
+    """Punto de entrada de un proceso worker"""
+    import django
+
+    django.setup()
+    try:
+        work(stop, poll_interval, once, name, write=lambda line: print(line, flush=True))
+    except KeyboardInterrupt:
+        pass  # Ctrl+C llega a todo el grupo; el proceso principal coordina la salida